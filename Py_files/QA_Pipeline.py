@@ -23,20 +23,31 @@ from __future__ import annotations
 
 import json
 import os
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Tuple
 
+import numpy as np
 import openai
 import pandas as pd
 from dotenv import load_dotenv
-from sklearn.preprocessing import StandardScaler
 
 # ─── Internal imports ──────────────────────────────────────────────────────── #
 from .llm_pipeline import twcs_processor as processor
 from .llm_pipeline.llm_extractor import LLMExtractor
 from .llm_pipeline.reranker import CrossEncoderReranker
 from .VectorDBStructure.db_structure import DatabaseStructure
-from .VectorDBStructure.query import query_similar
+from .VectorDBStructure.query import entity_vocabulary, index_version, query_similar, query_similar_multi
+from .semantic_cache import SemanticCache
+from .batching import BatchedEncoder, BatchedReranker
+from . import tracing
+from .tracing import Tracer, stage_totals
+from .VectorDBStructure.signature import entity_signature
 from CONFIG import ENDBOT_PROMPT
 
 class QAPipeline:
@@ -47,6 +58,26 @@ class QAPipeline:
         es_top_k: int = 50,
         rerank_top_k: int = 50,
         hybrid_weights: Tuple[float, float] = (0.7, 0.3),
+        vector_weights: Tuple[float, float] | None = None,
+        knn_candidates: int | None = None,
+        cascade_prefix: int | None = None,
+        cascade_margin: float = 0.05,
+        candidate_token_budget: int | None = 256,
+        diversity: str = "signature",
+        mmr_lambda: float = 0.7,
+        payload_token_budget: int | None = 2000,
+        parallel: bool = True,
+        stage_workers: int = 4,
+        llm_workers: int = 6,
+        extraction: str = "llm",
+        semantic_cache: SemanticCache | None = None,
+        cache_version_interval: float = 30.0,
+        micro_batching: bool = False,
+        batch_wait_ms: float = 2.0,
+        max_batch_size: int = 32,
+        tracer: Tracer | None = None,
+        llm_client: Any | None = None,
+        retriever: Any | None = None,
         openai_api_key: str | None = None,
     ) -> None:
         """Create a pipeline instance.
@@ -59,56 +90,347 @@ class QAPipeline:
             Number of candidates to feed into the cross‑encoder.
         hybrid_weights
             Tuple of weights ``(elastic_w, rerank_w)`` for hybrid scoring.
+        vector_weights
+            Optional ``(intent_w, conversation_w)``. When given, retrieval
+            scores the separately stored intent / conversation vectors with
+            these weights instead of the single summed ``Embedding`` field.
+        knn_candidates
+            When given, Elasticsearch retrieval is an approximate ``knn``
+            search over the HNSW graph with this many candidates per shard,
+            instead of exact brute‑force ``script_score``. Needed for an
+            ``int8_hnsw`` index (``store_embeddings --quantize int8``) to
+            make any difference. Not combinable with ``vector_weights``.
+        cascade_prefix
+            Enables cascade reranking: only the first ``cascade_prefix`` hits
+            are scored, and the depth doubles (up to ``rerank_top_k``) only
+            while the ranking is ambiguous. *None* reranks all candidates.
+        cascade_margin
+            Retrieval‑score gap between the current top‑n and the next
+            unscored hit above which retrieval is considered confident.
+        candidate_token_budget
+            Token budget per conversation passed to the cross‑encoder. Each
+            candidate is compacted to its opening customer issue and the
+            company's resolution turns within this budget. *None* passes the
+            whole conversation (truncated by the tokenizer).
+        diversity
+            How the final top‑n is diversified: ``"signature"`` drops hits
+            whose (Entities, Relationships) exactly repeat a better hit;
+            ``"mmr"`` runs maximal‑marginal‑relevance over the candidate
+            embeddings so near‑duplicate conversations are skipped too.
+        mmr_lambda
+            MMR trade‑off, 1.0 = pure relevance, 0.0 = pure novelty.
+        payload_token_budget
+            Upper bound on the RAG payload size in LLM tokens (counted
+            locally with ``tiktoken`` when installed, otherwise the
+            reranker's tokenizer). Lower‑ranked evidence is trimmed first.
+            *None* disables the limit.
+        parallel
+            Overlap independent stages: the conversation half of the query
+            embedding does not depend on the extracted intents, so it is
+            encoded while the extraction runs (the LLM extraction with its
+            three entity prompts fanned out); only the intent half is
+            embedded afterwards. Results match the serial path.
+        stage_workers, llm_workers
+            Threads of the pools behind ``parallel``, shared by all requests
+            on this pipeline: one conversation embedding per request in
+            flight runs on the stage pool, three entity prompts on the LLM
+            pool. Size them
+            for the number of concurrent requests (e.g. the HTTP service).
+        extraction
+            How query intents are obtained before embedding: ``"llm"`` (the
+            four extraction prompts), ``"keywords"`` (products / services /
+            issue types already present in the index, matched in the query
+            text) or ``"none"`` (the cleaned query alone is embedded). The
+            last two skip the LLM entirely.
+        semantic_cache
+            Optional :class:`SemanticCache`. Near‑duplicate queries (by the
+            embedding of the cleaned query) return the cached answer and
+            payload without running the pipeline.
+        cache_version_interval
+            Seconds between index‑version checks; the cache is cleared when
+            the index behind ``chat_embeddings`` changes.
+        micro_batching
+            Route query embedding and cross‑encoder scoring through
+            :mod:`batching`, so concurrent ``run_*`` calls (e.g. from the
+            HTTP service) share forward passes.
+        batch_wait_ms
+            Longest a call waits for others to join its batch.
+        max_batch_size
+            Most calls coalesced into one batch.
+        tracer
+            :class:`Tracer` that times every stage (latency histograms and,
+            when installed, OpenTelemetry spans). Share one across pipelines
+            to aggregate them; a private one is created if *None*.
+        llm_client
+            OpenAI‑compatible client used for extraction and answers instead
+            of ``openai.OpenAI`` (e.g. the deterministic stub in ``bench``).
+            No API key is needed when it is given.
+        retriever
+            Object with ``query_similar(embedding, k)`` (and
+            ``query_similar_multi`` when ``vector_weights`` is set, and
+            ``entity_vocabulary()`` for ``extraction="keywords"``) used
+            instead of Elasticsearch, e.g. a ``LocalVectorStore``.
         openai_api_key
             If *None*, the key is read from the ``OPENAI_API_KEY`` env‑var.
         """
         # Load secrets just once
-        load_dotenv()
-        key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        if not key:
-            raise RuntimeError("OPENAI_API_KEY not found in environment")
-        self.client = openai.OpenAI(api_key=key)
+        if llm_client is None:
+            load_dotenv()
+            key = openai_api_key or os.getenv("OPENAI_API_KEY")
+            if not key:
+                raise RuntimeError("OPENAI_API_KEY not found in environment")
+            llm_client = openai.OpenAI(api_key=key)
+        self.client = llm_client
+        if knn_candidates is not None and vector_weights is not None:
+            raise ValueError("knn_candidates cannot be combined with vector_weights")
+        if retriever is not None and vector_weights is not None and not hasattr(retriever, "query_similar_multi"):
+            raise ValueError("vector_weights needs a retriever with query_similar_multi")
+        self.retriever = retriever
 
         # Heavy components (constructed once)
         self.db = DatabaseStructure()
         self.reranker = CrossEncoderReranker(top_k=rerank_top_k)
+        if micro_batching:
+            self.db.model = BatchedEncoder(self.db.model, max_batch_size, batch_wait_ms)
+            self.reranker = BatchedReranker(self.reranker, max_batch_size, batch_wait_ms)
+        self.extractor = LLMExtractor(
+            dataframe=pd.DataFrame(columns=["structured_conversations"]),
+            client=self.client,
+        )
 
         # Config
         self.es_top_k = es_top_k
         self.rerank_top_k = rerank_top_k
         self.w_sim, self.w_rerank = hybrid_weights
+        self.vector_weights = vector_weights
+        self.knn_candidates = knn_candidates
+        self.cascade_prefix = cascade_prefix
+        self.cascade_margin = cascade_margin
+        self.candidate_token_budget = candidate_token_budget
+        if diversity not in ("signature", "mmr"):
+            raise ValueError(f"diversity must be 'signature' or 'mmr', got {diversity!r}")
+        self.diversity = diversity
+        self.mmr_lambda = mmr_lambda
+        self.payload_token_budget = payload_token_budget
+        self._encode, self._decode = self._load_llm_tokenizer()
+        self.parallel = parallel
+        if extraction not in ("llm", "keywords", "none"):
+            raise ValueError(f"extraction must be 'llm', 'keywords' or 'none', got {extraction!r}")
+        self.extraction = extraction
+        self._vocab_patterns: Dict[str, re.Pattern] | None = None
+        self.semantic_cache = semantic_cache
+        self.cache_version_interval = cache_version_interval
+        self._version_checked = float("-inf")
+        self.tracer = tracer or Tracer()
+        # Two pools so stage tasks can wait on LLM tasks without deadlocking
+        self._stage_pool = ThreadPoolExecutor(max_workers=stage_workers, thread_name_prefix="qa-stage") if parallel else None
+        self._llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="qa-llm") if parallel else None
 
     # ── Public API ────────────────────────────────────────────────────────── #
 
     def run_with_payload(self, query: str, top_n: int = 5) -> Tuple[str, str]:
         """Answer *query* and return (assistant_answer, rag_payload_json)."""
+        details = self.run_with_details(query, top_n)
+        return details["answer"], details["payload"]
+
+    def run_with_details(self, query: str, top_n: int = 5, profile: str | None = None) -> Dict[str, Any]:
+        """Like :meth:`run_with_payload`, plus per‑query diagnostics.
+
+        Returns a dict with ``answer``, ``payload``, ``chat_ids`` (ChatIDs
+        of the selected evidence, best first), ``payload_tokens``
+        (size of the payload in LLM tokens), ``rerank_depth`` (number of
+        candidates scored by the cross‑encoder), ``timeline`` (one
+        ``{stage, start_ms, end_ms, thread}`` entry per stage, relative to
+        the start of the request, so overlapping stages are visible),
+        ``timings`` (``{stage: ms}``) and ``cache_hit`` (plus
+        ``similarity`` when served from the semantic cache).
+
+        ``profile="cprofile"`` or ``"pyinstrument"`` profiles this one
+        request and adds the text report as ``profile``.
+        """
+        if profile is not None:
+            with tracing.profile(profile) as prof:
+                details = self.run_with_details(query, top_n)
+            return {**details, "profile": prof["report"]}
+
+        t0 = time.perf_counter()
+        with self.tracer.span("request", top_n=top_n):
+            cached, cache_key = self.cache_lookup(query, top_n)
+            if cached is not None:
+                cached["total_ms"] = (time.perf_counter() - t0) * 1000
+                return cached
+
+            details = self.prepare(query, top_n, t0)
+            with self._stage(details["timeline"], t0, "call_llm"):
+                details["answer"] = self._call_llm(details["payload"])
+        details["timings"] = stage_totals(details["timeline"])
+        details["total_ms"] = (time.perf_counter() - t0) * 1000
+        self.cache_store(cache_key, details, top_n)
+        return details
+
+    def stream_with_payload(self, query: str, top_n: int = 5) -> Iterator[Tuple[str, Any]]:
+        """Streaming variant of :meth:`run_with_details`.
+
+        Yields ``(event, data)`` tuples:
+
+        ▪ ``("payload", details)`` as soon as retrieval is done (``details``
+          as in :meth:`run_with_details`, without ``answer``);
+        ▪ ``("token", text)`` for every answer chunk as it arrives;
+        ▪ ``("done", details)`` with the full ``answer``, ``ttft_ms`` (time
+          to first token; ``total_ms`` when no chunk arrived) and ``total_ms``.
+
+        The whole stream is traced as one ``request`` span, like
+        :meth:`run_with_details`.
+        """
+        t0 = time.perf_counter()
+        with self.tracer.span("request", top_n=top_n, stream=True):
+            cached, cache_key = self.cache_lookup(query, top_n)
+            if cached is not None:
+                yield "payload", cached
+                yield "token", cached["answer"]
+                cached["ttft_ms"] = cached["total_ms"] = (time.perf_counter() - t0) * 1000
+                yield "done", cached
+                return
+
+            details = self.prepare(query, top_n, t0)
+            yield "payload", details
+
+            chunks: List[str] = []
+            with self._stage(details["timeline"], t0, "call_llm"):
+                for chunk in self._call_llm_stream(details["payload"]):
+                    if not chunks:
+                        details["ttft_ms"] = (time.perf_counter() - t0) * 1000
+                    chunks.append(chunk)
+                    yield "token", chunk
+        details["answer"] = "".join(chunks)
+        details["timings"] = stage_totals(details["timeline"])
+        details["total_ms"] = (time.perf_counter() - t0) * 1000
+        details.setdefault("ttft_ms", details["total_ms"])
+        self.cache_store(cache_key, details, top_n)
+        yield "done", details
+
+    def cache_lookup(self, query: str, top_n: int = 5) -> Tuple[Dict[str, Any] | None, Any]:
+        """Semantic‑cache probe: ``(cached_details | None, cache_key)``.
+
+        ``cache_key`` is passed back to :meth:`cache_store` on a miss. Both
+        are no‑ops (``(None, None)``) when no cache is configured.
+        """
+        if self.semantic_cache is None:
+            return None, None
+        query_vec = self._cache_vector(query)
+        cached = self.semantic_cache.lookup(query_vec, tag=top_n)
+        if cached is not None:
+            cached["cache_hit"] = True
+        return cached, query_vec
+
+    def cache_store(self, cache_key: Any, details: Dict[str, Any], top_n: int = 5) -> None:
+        details["cache_hit"] = False
+        if self.semantic_cache is not None and cache_key is not None:
+            self.semantic_cache.put(cache_key, dict(details), tag=top_n)
+
+    def prepare(self, query: str, top_n: int = 5, t0: float | None = None) -> Dict[str, Any]:
+        """Everything up to (not including) the final LLM call.
+
+        Returns the :meth:`run_with_details` dict without ``answer``; useful
+        for callers that make the answer call themselves (e.g. async serving).
+        """
+        t0 = time.perf_counter() if t0 is None else t0
+        timeline: List[dict] = []
+
         # 1) Pre‑process user query
-        cleaned_conv, structured_conv = self._preprocess_query(query)
+        with self._stage(timeline, t0, "preprocess"):
+            cleaned_conv, structured_conv = self._preprocess_query(query)
 
-        # 2) Extract entities & relationships via LLM
-        entities, relationships = self._extract_intents(structured_conv)
+        # 2) Extract entities & relationships, overlapped with the
+        #    (intent‑independent) conversation embedding when running in parallel
+        overlap = self.parallel and self.extraction != "none"
+        if overlap:
+            # copy_context keeps the worker's stage spans under this request's trace
+            conv_future = self._stage_pool.submit(
+                contextvars.copy_context().run, self._embed_conversation, cleaned_conv, timeline, t0)
+        with self._stage(timeline, t0, "extract_intents"):
+            if self.extraction == "llm":
+                entities, relationships = self._extract_intents(structured_conv)
+            elif self.extraction == "keywords":
+                entities, relationships = self._match_intents(cleaned_conv), []
 
-        # 3) Embed query for vector search
-        embedding = self.db.text_to_embedding(
-            cleaned_conv, entities, relationships
-        ).tolist()
+        # 3) Embed query & retrieve candidates
+        with self._stage(timeline, t0, "embed"):
+            if self.extraction == "none":
+                emb_intent, emb_conv = self._embed_raw(cleaned_conv)
+            elif overlap:
+                emb_intent = self.db.model.encode(
+                    self.db.structured_to_text(cleaned_conv, entities, relationships),
+                    normalize_embeddings=True)
+                emb_conv = conv_future.result()
+            else:
+                emb_intent, emb_conv = self.db.text_to_embeddings(cleaned_conv, entities, relationships)
+        with self._stage(timeline, t0, "search"):
+            hits = self._search(emb_intent, emb_conv)
 
-        # 4) Retrieve + cross‑encoder‑rerank
-        hits = query_similar(embedding, k=self.es_top_k)
-        candidates = [h["_source"]["Conversation_History"]["conversation"] for h in hits]
-        reranked = self.reranker.rerank(query, candidates)
+        # 4) Cross‑encoder scores, index‑aligned with hits
+        with self._stage(timeline, t0, "rerank"):
+            rerank_scores = self._rerank_scores(query, hits, top_n)
 
         # 5) Merge scores & compute hybrid ranking
-        hybrid_df = self._build_hybrid_dataframe(query, hits, reranked)
-        topk_df = self._select_diverse_topk(hybrid_df, k=top_n)
+        with self._stage(timeline, t0, "hybrid"):
+            order, hybrid = self._hybrid_rank(hits, rerank_scores)
+            if self.diversity == "mmr":
+                picks = self._select_mmr(hits, order, hybrid, k=top_n)
+            else:
+                picks = self._select_diverse_topk(hits, order, k=top_n)
 
-        # 6) Build RAG payload & call LLM for final answer
-        payload = self._build_payload(topk_df, query)
-        answer = self._call_llm(payload)
-        return answer, payload
+        # 6) Build RAG payload for the final answer
+        with self._stage(timeline, t0, "build_payload"):
+            payload, payload_tokens = self._build_payload([hits[i] for i in picks], query)
+        return {
+            "payload": payload,
+            "chat_ids": [hits[i]["_source"]["ChatID"] for i in picks],
+            "payload_tokens": payload_tokens,
+            "rerank_depth": int(np.count_nonzero(~np.isnan(rerank_scores))),
+            "timeline": timeline,
+            "timings": stage_totals(timeline),
+        }
 
     # ── Internal helpers ──────────────────────────────────────────────────── #
 
+    def _cache_vector(self, query: str) -> np.ndarray:
+        """Semantic‑cache key: embedding of the cleaned query.
+
+        Also clears the cache when the index version changed (checked at
+        most every ``cache_version_interval`` seconds; Elasticsearch only).
+        """
+        now = time.monotonic()
+        if self.retriever is None and now - self._version_checked >= self.cache_version_interval:
+            self._version_checked = now
+            self.semantic_cache.ensure_version(index_version())
+        return self.db.model.encode(self._clean_single(query), normalize_embeddings=True)
+
+    @contextmanager
+    def _stage(self, timeline: List[dict], t0: float, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            with self.tracer.span(name):
+                yield
+        finally:
+            timeline.append(
+                {
+                    "stage": name,
+                    "start_ms": (start - t0) * 1000,
+                    "end_ms": (time.perf_counter() - t0) * 1000,
+                    "thread": threading.current_thread().name,
+                }
+            )
+
+    def _embed_conversation(self, cleaned_conv: str, timeline: List[dict], t0: float) -> np.ndarray:
+        """Conversation half of :meth:`DatabaseStructure.text_to_embeddings`.
+
+        It does not depend on the extracted intents, so :meth:`prepare`
+        runs it on the stage pool while the extraction is in flight.
+        """
+        with self._stage(timeline, t0, "embed_conversation"):
+            return self.db.model.encode(self.db.process_conversation(cleaned_conv), normalize_embeddings=True)
+
     @staticmethod
     def _clean_single(text: str) -> str:
         return processor.TWCSProcessor._clean_single(text)
@@ -123,63 +445,225 @@ class QAPipeline:
         return cleaned, structured
 
     def _extract_intents(self, structured_conv: str) -> Tuple[dict, list]:
-        df = pd.DataFrame([[structured_conv, structured_conv]],
-                          columns=["cleaned_conversation", "structured_conversations"])
-        pipe = LLMExtractor(dataframe=df)
-        df1 = pipe.extract_entities()
-        df2 = pipe.process_entities_json()
-        df3 = pipe.extract_relationships()
-        entities = df3["entities"].values[0]
-        relationships = self.db.fix_relationships(df3["relationship"].values[0])
+        entities, relationship = self.extractor.extract_one(structured_conv, executor=self._llm_pool)
+        relationships = self.db.fix_relationships(relationship)
         return entities, relationships
 
-    def _build_hybrid_dataframe(
-        self,
-        query: str,
-        hits: List[dict],
-        reranked: List[Tuple[str, float]],
-    ) -> pd.DataFrame:
-        # map conversation → (score, rank)
-        score_rank = {c: (s, r + 1) for r, (c, s) in enumerate(reranked)}
-        rows: List[dict] = []
-        for h in hits:
-            src = h["_source"]
-            conv = src["Conversation_History"]["conversation"]
-            rerank_score, rerank_rank = score_rank.get(conv, (0.0, None))
-            rows.append(
-                {
-                    "prompt": query,
-                    "id": h["_id"],
-                    "similarity_score": h["_score"],
-                    "rerank_score": rerank_score,
-                    "rerank_rank": rerank_rank,
-                    "ChatID": src["ChatID"],
-                    "Company_name": src["Company_name"],
-                    "Conversation_History": conv,
-                    "Entities": json.dumps(src["Entities"]),
-                    "Relationships": json.dumps(src["Relationships"]),
-                }
-            )
-        df = pd.DataFrame(rows)
-        scaler = StandardScaler()
-        df[["sim_norm", "rerank_norm"]] = scaler.fit_transform(
-            df[["similarity_score", "rerank_score"]].fillna(0)
+    def _match_intents(self, cleaned_conv: str) -> str:
+        """Entities JSON built by matching known index entities in the query.
+
+        The vocabulary (distinct products / services / issue types in the
+        index, or in the injected retriever) is fetched once and compiled
+        into one regex per field.
+        """
+        if self._vocab_patterns is None:
+            self._vocab_patterns = {}
+            vocabulary = entity_vocabulary if self.retriever is None else self.retriever.entity_vocabulary
+            for field, terms in vocabulary().items():
+                terms = sorted({t.lower() for t in terms if t}, key=len, reverse=True)
+                if terms:
+                    alternation = "|".join(re.escape(t) for t in terms)
+                    self._vocab_patterns[field] = re.compile(rf"\b(?:{alternation})\b")
+        text = cleaned_conv.lower()
+        entities = {
+            field: list(dict.fromkeys(pattern.findall(text)))
+            for field, pattern in self._vocab_patterns.items()
+        }
+        for field in ("products", "services", "issue_types"):
+            entities.setdefault(field, [])
+        return json.dumps(entities)
+
+    def _embed_raw(self, cleaned_conv: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Query vectors from the cleaned query alone (no intents)."""
+        embedding = self.db.model.encode(cleaned_conv, normalize_embeddings=True)
+        return embedding, embedding
+
+    def _search(self, emb_intent: np.ndarray, emb_conv: np.ndarray) -> List[dict]:
+        if self.vector_weights is None:
+            # same vector as DatabaseStructure.text_to_embedding
+            embedding = (emb_intent + emb_conv).tolist()
+            if self.retriever is not None:
+                return self.retriever.query_similar(embedding, k=self.es_top_k)
+            return query_similar(embedding, k=self.es_top_k, num_candidates=self.knn_candidates)
+        search_multi = query_similar_multi if self.retriever is None else self.retriever.query_similar_multi
+        return search_multi(
+            emb_intent.tolist(), emb_conv.tolist(),
+            weights=self.vector_weights, k=self.es_top_k,
         )
-        df["hybrid_score"] = self.w_sim * df["sim_norm"] + self.w_rerank * df["rerank_norm"]
-        return df.sort_values("hybrid_score", ascending=False).reset_index(drop=True)
+
+    def _rerank_scores(self, query: str, hits: List[dict], top_n: int) -> np.ndarray:
+        """Cross‑encoder scores for a prefix of the hits, NaN for the rest.
+
+        Without a cascade the prefix is the first ``rerank_top_k`` hits.
+        With one, scoring starts at ``cascade_prefix`` hits and doubles while
+        :meth:`_cascade_ambiguous` says deeper hits could still matter.
+        """
+        max_depth = min(self.rerank_top_k, len(hits))
+        candidates = [
+            self._compact_candidate(h["_source"]["Conversation_History"]["conversation"])
+            for h in hits[:max_depth]
+        ]
+        scores = np.full(len(hits), np.nan)
+
+        depth = max_depth if self.cascade_prefix is None else min(max(self.cascade_prefix, 1), max_depth)
+        scores[:depth] = self.reranker.score(query, candidates[:depth])
+        while depth < max_depth and self._cascade_ambiguous(hits, scores, depth, top_n):
+            new_depth = min(depth * 2, max_depth)
+            scores[depth:new_depth] = self.reranker.score(query, candidates[depth:new_depth])
+            depth = new_depth
+        return scores
+
+    def _compact_candidate(self, conversation: str) -> str:
+        """Bounded‑length reranker passage for one conversation.
+
+        Keeps turns by usefulness until ``candidate_token_budget`` is spent:
+        the first customer turn (the issue), the last company turn (the
+        resolution), then the other company turns newest first and the other
+        customer turns oldest first. The issue may use at most half the
+        budget while the resolution still needs the rest, so a long opening
+        message cannot crowd it out. Kept turns are emitted in their original
+        order; a turn that does not fit is cut to the remaining budget.
+        """
+        if self.candidate_token_budget is None:
+            return conversation
+        turns = self._parse_conversation(conversation)
+        if not turns:
+            return conversation
+
+        tokenizer = self.reranker.tokenizer
+        ids = tokenizer([t["message"] for t in turns], add_special_tokens=False)["input_ids"]
+        if sum(len(i) for i in ids) <= self.candidate_token_budget:
+            return conversation
+
+        kept: Dict[int, str] = {}
+        budget = self.candidate_token_budget
+
+        def _keep(i: int, limit: int) -> bool:
+            # Turn i within `limit` tokens (role prefix included); False once cut or dropped
+            nonlocal budget
+            cost = len(ids[i]) + 2  # role prefix
+            if cost <= limit:
+                kept[i] = turns[i]["message"]
+                budget -= cost
+                return True
+            if limit > 8:
+                kept[i] = tokenizer.decode(ids[i][: limit - 2])
+                budget -= limit
+            return False
+
+        order = self._turn_priority(turns)
+        if len(order) > 1:
+            reserve = min(len(ids[order[1]]) + 2, budget // 2)
+            _keep(order[0], budget - reserve)
+            order = order[1:]
+        for i in order:
+            if not _keep(i, budget):
+                break
+        return "\n".join(f"{turns[i]['role']} {kept[i]}" for i in sorted(kept))
+
+    @staticmethod
+    def _turn_priority(turns: List[Dict[str, str]]) -> List[int]:
+        """Turn indices by usefulness: issue, resolution, other company, other customer."""
+        customer = [i for i, t in enumerate(turns) if t.get("role") == "Customer"]
+        company = [i for i, t in enumerate(turns) if t.get("role") == "Company"]
+        return customer[:1] + company[-1:] + company[-2::-1] + customer[1:]
+
+    def _cascade_ambiguous(
+        self, hits: List[dict], scores: np.ndarray, depth: int, top_n: int
+    ) -> bool:
+        """Whether hits beyond *depth* could still reach the top‑n.
+
+        Confident (stop) when retrieval already separates the top‑n from the
+        next unscored hit by ``cascade_margin``, or when the cross‑encoder
+        keeps its top‑n in the upper half of the scored prefix (it is not
+        promoting hits from the tail, so deeper ones are unlikely to win).
+        """
+        n = min(top_n, depth)
+        retrieval_gap = hits[n - 1]["_score"] - hits[depth]["_score"]
+        if retrieval_gap >= self.cascade_margin:
+            return False
+        best = np.argsort(-scores[:depth], kind="stable")[:n]
+        return bool(best.max() >= depth // 2)
+
+    def _hybrid_rank(
+        self, hits: List[dict], rerank_scores: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Hit indices sorted by hybrid score (best first), and the scores.
+
+        Both signals are z‑normalised over the candidate set (population std,
+        unit scale for constant columns) and mixed with ``hybrid_weights``.
+        """
+        sim = np.fromiter((h["_score"] for h in hits), dtype=float, count=len(hits))
+        # hits left unscored (cascade / depth cut‑off) rank with the weakest scored one
+        scored = ~np.isnan(rerank_scores)
+        rerank = np.where(scored, rerank_scores, rerank_scores[scored].min() if scored.any() else 0.0)
+
+        def _z(x: np.ndarray) -> np.ndarray:
+            std = x.std()
+            return (x - x.mean()) / (std if std > 0 else 1.0)
+
+        hybrid = self.w_sim * _z(sim) + self.w_rerank * _z(rerank)
+        return np.argsort(-hybrid, kind="stable"), hybrid
 
     @staticmethod
-    def _select_diverse_topk(df: pd.DataFrame, k: int = 5) -> pd.DataFrame:
+    def _select_diverse_topk(hits: List[dict], order: np.ndarray, k: int = 5) -> List[int]:
+        """First *k* hits in *order* with distinct (Entities, Relationships)."""
         seen: set = set()
-        picks: List[dict] = []
-        for _, row in df.iterrows():
-            key = (row["Entities"], row["Relationships"])
+        picks: List[int] = []
+        for i in order:
+            src = hits[i]["_source"]
+            key = src.get("Signature") or entity_signature(src)
             if key not in seen:
-                picks.append(row)
+                picks.append(int(i))
                 seen.add(key)
             if len(picks) == k:
                 break
-        return pd.DataFrame(picks)
+        return picks
+
+    def _candidate_vectors(self, hits: List[dict]) -> np.ndarray:
+        """L2‑normalised vectors for *hits*, from ``_source`` when stored.
+
+        Falls back to encoding the conversation text (e.g. when vectors are
+        excluded from ``_source``); all missing ones are encoded in one batch.
+        """
+        vecs: List[Any] = [
+            h["_source"].get("Conversation_Embedding", h["_source"].get("Embedding")) for h in hits
+        ]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            texts = [hits[i]["_source"]["Conversation_History"]["conversation"] for i in missing]
+            for i, v in zip(missing, self.db.model.encode(texts)):
+                vecs[i] = v
+        mat = np.asarray(vecs, dtype=np.float32)
+        return mat / np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12)
+
+    def _select_mmr(
+        self, hits: List[dict], order: np.ndarray, hybrid: np.ndarray, k: int = 5
+    ) -> List[int]:
+        """Maximal‑marginal‑relevance pick of *k* hits.
+
+        Runs over the best ``max(4k, 20)`` hits by hybrid score. Relevance is
+        the min‑max scaled hybrid score; redundancy is the highest cosine
+        similarity to an already picked hit.
+        """
+        pool = order[: max(4 * k, 20)]
+        if len(pool) == 0:
+            return []
+        rel = hybrid[pool]
+        span = rel.max() - rel.min()
+        rel = (rel - rel.min()) / (span if span > 0 else 1.0)
+        vecs = self._candidate_vectors([hits[i] for i in pool])
+        sim = vecs @ vecs.T
+
+        chosen = [int(np.argmax(rel))]
+        max_sim = sim[chosen[0]].copy()
+        while len(chosen) < min(k, len(pool)):
+            mmr = self.mmr_lambda * rel - (1.0 - self.mmr_lambda) * max_sim
+            mmr[chosen] = -np.inf
+            j = int(np.argmax(mmr))
+            chosen.append(j)
+            np.maximum(max_sim, sim[j], out=max_sim)
+        return [int(pool[j]) for j in chosen]
 
     # ── Payload & LLM call helpers ────────────────────────────────────────── #
 
@@ -201,33 +685,87 @@ class QAPipeline:
                 parsed.append({"role": role, "message": msg})
         return parsed
 
-    def _build_payload(self, df: pd.DataFrame, query: str) -> str:
+    def _load_llm_tokenizer(self):
+        """(encode, decode) functions used to measure payload size locally."""
+        try:
+            import tiktoken
+
+            enc = tiktoken.encoding_for_model("gpt-4o-mini")
+            return enc.encode, enc.decode
+        except Exception:  # tiktoken missing, or its BPE file unavailable offline
+            tok = self.reranker.tokenizer
+            return (lambda text: tok.encode(text, add_special_tokens=False)), tok.decode
+
+    def _dump_payload(self, payload: dict) -> Tuple[str, int]:
+        # Compact separators: pretty‑print whitespace is pure token overhead
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        return text, len(self._encode(text))
+
+    def _build_payload(self, hits: List[dict], query: str) -> Tuple[str, int]:
+        """RAG payload JSON for *hits* (best first) and its size in tokens.
+
+        When ``payload_token_budget`` is exceeded, evidence is trimmed from
+        the lowest‑ranked hit upwards, one step at a time: conversations are
+        reduced to the issue and resolution turns, then intents and
+        relationships are dropped, then whole hits (never the best one). As
+        a last resort the longest messages of the best hit are cut.
+        """
         results: List[dict] = []
-        for _, row in df.iterrows():
-            conv_raw = row["Conversation_History"]
+        for h in hits:
+            src = h["_source"]
+            conv_raw = src["Conversation_History"]["conversation"]
             conv = (
                 json.loads(conv_raw)
                 if isinstance(conv_raw, str) and conv_raw.strip().startswith("[")
                 else self._parse_conversation(conv_raw)
             )
-            try:
-                intents = json.loads(row["Entities"])
-            except Exception:
-                intents = {}
-            try:
-                relationships = json.loads(row["Relationships"])
-            except Exception:
-                relationships = []
             results.append(
                 {
-                    "company_name": row["Company_name"],
+                    "company_name": src["Company_name"],
                     "conversation": conv,
-                    "intents": intents,
-                    "relationships": relationships,
+                    "intents": src.get("Entities", {}),
+                    "relationships": src.get("Relationships", []),
                 }
             )
         payload = {"query": query.strip(), "retrieved_answers": results}
-        return json.dumps(payload, ensure_ascii=False, indent=2)
+        text, n_tokens = self._dump_payload(payload)
+        budget = self.payload_token_budget
+        if budget is None or n_tokens <= budget:
+            return text, n_tokens
+
+        def _key_turns(entry: dict) -> None:
+            turns = entry["conversation"]
+            if isinstance(turns, list) and all(isinstance(t, dict) for t in turns):
+                entry["conversation"] = [turns[i] for i in sorted(self._turn_priority(turns)[:2])]
+
+        def _no_metadata(entry: dict) -> None:
+            entry.pop("intents", None)
+            entry.pop("relationships", None)
+
+        for step in (_key_turns, _no_metadata, None):
+            for i in reversed(range(len(results))):
+                if step is not None:
+                    step(results[i])
+                elif i > 0:
+                    results.pop(i)
+                else:
+                    continue
+                text, n_tokens = self._dump_payload(payload)
+                if n_tokens <= budget:
+                    return text, n_tokens
+
+        # Best hit alone is still too large: shorten its longest messages
+        turns = results[0]["conversation"] if results else []
+        while n_tokens > budget and isinstance(turns, list) and turns:
+            longest = max(range(len(turns)), key=lambda i: len(turns[i].get("message", "")))
+            ids = self._encode(turns[longest].get("message", ""))
+            keep = len(ids) - (n_tokens - budget) - 1
+            if keep <= 0:
+                turns.pop(longest)
+            else:
+                turns[longest]["message"] = self._decode(ids[:keep])
+            text, n_tokens = self._dump_payload(payload)
+        return text, n_tokens
 
     def _call_llm(self, payload: str) -> str:
         response = self.client.chat.completions.create(
@@ -241,6 +779,21 @@ class QAPipeline:
         )
         return response.choices[0].message.content
 
+    def _call_llm_stream(self, payload: str) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": ENDBOT_PROMPT},
+                {"role": "user", "content": payload},
+            ],
+            temperature=0,
+            top_p=0.95,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
 
 # ─── CLI quick‑test ────────────────────────────────────────────────────────── #
 if __name__ == "__main__":
@@ -9,11 +9,20 @@ class DatabaseStructure:
     self.json_structured = []
 
   def fix_relationships(self,relationship):
-    
-    relationship_re = r'\[\{(.*?)\}\]' 
-    relationship_fixed =  re.findall(relationship_re, relationship,flags=re.DOTALL)
-   
-    return relationship_fixed
+    ###
+    ### Parses the RDF-triple list returned by RELATIONSHIP_PROMPT (one or many
+    ### lines) into [{"subject", "predicate", "object"}, ...]; [] if unparsable
+    ###
+    if not isinstance(relationship,str):
+      return []
+    match = re.search(r'\[.*\]', relationship, flags=re.DOTALL)
+    if match is None:
+      return []
+    try:
+      triples = json.loads(match.group(0))
+    except json.JSONDecodeError:
+      return []
+    return [t for t in triples if isinstance(t,dict)] if isinstance(triples,list) else []
     
 
   def convertExcel(self,save_path):
@@ -27,13 +36,16 @@ class DatabaseStructure:
     for i in range(len(self.df)):
       rel = relationships[i]
       relationship_fixed = self.fix_relationships(rel)
+      embedding_intent, embedding_text = self.text_to_embeddings(conversations_structured[i],entities[i],relationship_fixed)
       json_data = {
           "ChatID": str(i+1),
           "Company_name": company_names[i],
           "Conversation_History": {"conversation": conversations[i]},
           "Entities": entities[i],
           "Relationships": relationship_fixed,
-          "Embedding" : self.text_to_embedding(conversations_structured[i],entities[i],relationship_fixed)
+          "Embedding" : embedding_intent + embedding_text,
+          "Intent_Embedding" : embedding_intent,
+          "Conversation_Embedding" : embedding_text
       }
       self.json_structured.append(str(json_data))
 
@@ -96,20 +108,30 @@ class DatabaseStructure:
   
 
 
-  def text_to_embedding(self,conversation,entity,relationship):
+  def text_to_embeddings(self,conversation,entity,relationship):
     ###
     ### Relationships should be fixed before passing to this function
     ### For database embedding, it is called from convertExcel function
     ### fix_relationships function should be called before this function for individual embedding
     ###
+    ### Returns the intent and conversation vectors separately (both L2-normalised)
+    ### so they can be stored as two fields and weighted per query
+    ###
 
     text_intent = self.structured_to_text(conversation,entity,relationship)
     text_conversation = self.process_conversation(conversation)
-    embedding_intent = self.model.encode(text_intent)
-    
-    embedding_text = self.model.encode(text_conversation)
-    
-    
+    embedding_intent, embedding_text = self.model.encode(
+      [text_intent, text_conversation], normalize_embeddings=True)
+
+    return embedding_intent, embedding_text
+
+
+  def text_to_embedding(self,conversation,entity,relationship):
+    ###
+    ### Single-vector form stored in the legacy "Embedding" field
+    ###
+
+    embedding_intent, embedding_text = self.text_to_embeddings(conversation,entity,relationship)
     return embedding_intent + embedding_text
 
 
@@ -1,32 +1,36 @@
 #!/usr/bin/env python3
 import pandas as pd
 from sentence_transformers import SentenceTransformer
-from query import query_similar
+from query import query_similar_batch
 import json
 
 
-def main():
-    # 10 example prompts
-    prompts = [
-        "My Echo keeps playing the same song over and over, how do I fix recommendations?",
-        "I reset my PSN password but still can't sign in on my console.",
-        "After installing the latest Windows update, my PC is stuck on the login screen.",
-        "My UPS tracking shows delivery attempts that never happened.",
-        "I’d love a newsfeed feature on Spotify to see tour announcements.",
-        "My Uber account was disabled without notice—can you restore access?",
-        "I returned a package at a UPS Access Point; how can I confirm they received it?",
-        "My laptop battery drains fully when on sleep mode—any solutions?",
-        "I submitted feedback on Xbox but haven't received any confirmation.",
-        "My Windows 10 start menu won’t open after the last patch."
-    ]
+# 10 example prompts
+PROMPTS = [
+    "My Echo keeps playing the same song over and over, how do I fix recommendations?",
+    "I reset my PSN password but still can't sign in on my console.",
+    "After installing the latest Windows update, my PC is stuck on the login screen.",
+    "My UPS tracking shows delivery attempts that never happened.",
+    "I’d love a newsfeed feature on Spotify to see tour announcements.",
+    "My Uber account was disabled without notice—can you restore access?",
+    "I returned a package at a UPS Access Point; how can I confirm they received it?",
+    "My laptop battery drains fully when on sleep mode—any solutions?",
+    "I submitted feedback on Xbox but haven't received any confirmation.",
+    "My Windows 10 start menu won’t open after the last patch."
+]
+
 
+def main():
+    prompts = PROMPTS
     k = 10
     model = SentenceTransformer('all-MiniLM-L6-v2')
 
+    # Encode all prompts in one batch and search them in one _msearch call
+    embeddings = model.encode(prompts, batch_size=64)
+    all_hits = query_similar_batch(embeddings, k=k)
+
     rows = []
-    for prompt in prompts:
-        emb = model.encode(prompt).tolist()
-        hits = query_similar(emb, k=k)
+    for prompt, hits in zip(prompts, all_hits):
         row = {"prompt": prompt}
         for i, hit in enumerate(hits, start=1):
             src = hit["_source"]
@@ -19,11 +19,12 @@ def list_indices():
     # Connect to local Elasticsearch instance
     es = Elasticsearch("http://localhost:9200")
 
-    # Fetch and print all index names using keyword argument
+    # Fetch and print all index names (and their aliases) using keyword argument
     indices = es.indices.get_alias(index="*")
     print("Indices:")
-    for index in indices:
-        print(f"- {index}")
+    for index, info in indices.items():
+        aliases = ", ".join(info.get("aliases", {}))
+        print(f"- {index}" + (f" (aliases: {aliases})" if aliases else ""))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class LocalVectorStore:
+    """
+    In-memory brute-force vector store with the same hit format as
+    query.query_similar (`_id`, `_score`, `_source`), so it can stand in for
+    Elasticsearch in experiments and benchmarks.
+
+    Vectors are L2-normalised on load and kept as:
+    - "float32": exact cosine
+    - "float16": half the memory, near-exact cosine
+    - "int8":    symmetric per-vector scalar quantisation (1/4 of float32)
+    """
+
+    DTYPES = ("float32", "float16", "int8")
+
+    def __init__(self, documents, dtype="float32", vector_field="Embedding"):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"dtype must be one of {self.DTYPES}, got {dtype!r}")
+        self.dtype = dtype
+        self.vector_field = vector_field
+
+        vectors, self.ids, self.sources = [], [], []
+        for doc in documents:
+            vectors.append(doc[vector_field])
+            self.ids.append(str(doc["ChatID"]))
+            self.sources.append({k: v for k, v in doc.items() if k != vector_field})
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+        self.scales = None
+        if dtype == "float16":
+            self.vectors = vectors.astype(np.float16)
+        elif dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+        else:
+            self.vectors = vectors
+
+    @classmethod
+    def from_excel(cls, path, **kwargs):
+        # Same input as store_embeddings (output of DatabaseStructure.convertExcel)
+        try:
+            from .store_embeddings import iter_documents
+        except ImportError:
+            from store_embeddings import iter_documents
+        return cls(iter_documents(path), **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        # Memory held by the vectors (plus int8 scales)
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, queries):
+        """Cosine similarity matrix of shape (n_queries, n_docs)."""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        sims = q @ self.vectors.T.astype(np.float32, copy=False)
+        if self.scales is not None:
+            sims *= self.scales[None, :]
+        return sims
+
+    def top_k(self, queries, k=5):
+        """Indices and cosine scores of the k best documents per query, best first."""
+        sims = self.scores(queries)
+        k = min(k, sims.shape[1])
+        idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        part = np.take_along_axis(sims, idx, axis=1)
+        order = np.argsort(-part, axis=1)
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+    def _hits(self, idx, scores):
+        # +1.0 keeps scores non-negative, like the script_score query
+        return [
+            {"_id": self.ids[i], "_score": float(s) + 1.0, "_source": self.sources[i]}
+            for i, s in zip(idx, scores)
+        ]
+
+    def query_similar(self, embedding, k=5, **kwargs):
+        idx, scores = self.top_k(embedding, k)
+        return self._hits(idx[0], scores[0])
+
+    def entity_vocabulary(self, fields=("products", "services", "issue_types"), **kwargs):
+        # Distinct entity strings per Entities sub-field, like query.entity_vocabulary
+        vocab = {f: {} for f in fields}
+        for src in self.sources:
+            entities = src.get("Entities") or {}
+            for f in fields:
+                terms = entities.get(f) or []
+                vocab[f].update(dict.fromkeys([terms] if isinstance(terms, str) else terms))
+        return {f: list(terms) for f, terms in vocab.items()}
+
+    def query_similar_batch(self, embeddings, k=5, **kwargs):
+        # One matrix product for all queries
+        if len(embeddings) == 0:
+            return []
+        idx, scores = self.top_k(embeddings, k)
+        return [self._hits(i, s) for i, s in zip(idx, scores)]
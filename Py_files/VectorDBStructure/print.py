@@ -7,9 +7,8 @@ for hit in helpers.scan(
     client=es,
     index="chat_embeddings",
     query={"query": {"match_all": {}}},
-    _source=["ChatID", "Company_name", "Embedding"]  # fetch only what you need
+    _source=["ChatID", "Company_name"]  # fetch only what you need (vectors stay server-side)
 ):
     src = hit["_source"]
     print(f"ChatID={src['ChatID']} Company={src['Company_name']}")
-    # print("Embedding:", src["Embedding"])
     print("-" * 40)
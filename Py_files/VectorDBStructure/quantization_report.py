@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compares float32 / float16 / int8 vector storage on an embedding Excel file:
+memory footprint, recall@k against exact float32 search and, optionally,
+the on-disk size of Elasticsearch indices and the recall of approximate
+knn search on an index (e.g. int8_hnsw) against its exact script_score.
+
+Every document vector is used as a query (itself excluded from the results),
+so no labelled queries are needed.
+
+    python quantization_report.py VirginAmerica_Embedding.xlsx -k 10 \
+        --es-index chat_embeddings_v20250615120000 --es-index chat_embeddings_int8 \
+        --es-recall chat_embeddings_int8 --num-candidates 100
+"""
+import argparse
+import numpy as np
+from local_store import LocalVectorStore
+from store_embeddings import iter_documents
+
+
+def recall_at_k(reference_idx, approx_idx):
+    # Fraction of the exact top-k that the approximate search also returns
+    hits = [len(set(r) & set(a)) for r, a in zip(reference_idx, approx_idx)]
+    return float(np.sum(hits)) / reference_idx.size
+
+
+def top_k_excluding_self(store, queries, k):
+    # Full-precision queries against (possibly quantised) stored vectors
+    sims = store.scores(queries)
+    np.fill_diagonal(sims, -np.inf)
+    idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    return idx
+
+
+def es_estimates(n, dims, hnsw_m=16):
+    # Off-heap memory needed to keep vectors + HNSW graph hot (ES sizing guide)
+    graph = n * 4 * hnsw_m
+    return {
+        "float32 (hnsw)":    n * 4 * dims + graph,
+        "int8 (int8_hnsw)":  n * (dims + 4) + graph,
+    }
+
+
+def es_index_sizes(indices, host="http://localhost:9200"):
+    from elasticsearch import Elasticsearch
+    es = Elasticsearch(host, basic_auth=("elastic", "*pwASJfphV27RFS=BSWH"))
+    sizes = {}
+    for index in indices:
+        stats = es.indices.stats(index=index, metric="store")
+        sizes[index] = stats["_all"]["primaries"]["store"]["size_in_bytes"]
+    return sizes
+
+
+def es_knn_recall(index, queries, k, num_candidates):
+    # Same index, same queries: approximate knn vs exact brute-force search
+    from query import query_similar_batch
+    exact = query_similar_batch(queries, k=k, index=index)
+    approx = query_similar_batch(queries, k=k, index=index, num_candidates=num_candidates)
+    found = sum(len({h["_id"] for h in e} & {h["_id"] for h in a}) for e, a in zip(exact, approx))
+    return found / max(sum(len(e) for e in exact), 1)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Quantised vector storage report.")
+    p.add_argument("path", help="Embedding Excel produced by DatabaseStructure.convertExcel")
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--es-index", action="append", default=[], help="Index (or alias) to report size for")
+    p.add_argument("--es-recall", action="append", default=[], help="Index (or alias) to measure knn recall@k on")
+    p.add_argument("--num-candidates", type=int, default=100, help="knn candidates per shard")
+    p.add_argument("--es-queries", type=int, default=200, help="Document vectors used as knn queries")
+    args = p.parse_args()
+
+    docs = list(iter_documents(args.path))
+    stores = {dtype: LocalVectorStore(docs, dtype=dtype) for dtype in LocalVectorStore.DTYPES}
+    n, dims = stores["float32"].vectors.shape
+    k = min(args.k, n - 1)
+
+    queries = stores["float32"].vectors
+    reference = top_k_excluding_self(stores["float32"], queries, k)
+    print(f"Documents: {n}  dims: {dims}  k: {k}\n")
+    print(f"{'storage':<10}{'bytes':>14}{'ratio':>8}{'recall@k':>10}")
+    for dtype, store in stores.items():
+        recall = recall_at_k(reference, top_k_excluding_self(store, queries, k))
+        ratio = store.nbytes / stores["float32"].nbytes
+        print(f"{dtype:<10}{store.nbytes:>14,}{ratio:>8.2f}{recall:>10.4f}")
+
+    print("\nEstimated Elasticsearch off-heap vector memory:")
+    for name, size in es_estimates(n, dims).items():
+        print(f"- {name:<18} {size:>14,} bytes")
+
+    if args.es_index:
+        print("\nElasticsearch primary store size:")
+        for index, size in es_index_sizes(args.es_index).items():
+            print(f"- {index:<30} {size:>14,} bytes")
+
+    if args.es_recall:
+        queries = [doc["Embedding"] for doc in docs[:args.es_queries]]
+        print(f"\nElasticsearch knn recall@{args.k} (num_candidates={args.num_candidates}, "
+              f"{len(queries)} queries):")
+        for index in args.es_recall:
+            recall = es_knn_recall(index, queries, args.k, args.num_candidates)
+            print(f"- {index:<30} {recall:>14.4f}")
+
+
+if __name__ == "__main__":
+    main()
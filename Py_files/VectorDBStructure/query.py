@@ -1,17 +1,29 @@
+from functools import lru_cache
 from elasticsearch import Elasticsearch
 
 
-def query_similar(embedding, k=5, index="chat_embeddings", host="localhost", port=9200):
-    # connect with scheme
-    es = Elasticsearch(f"http://{host}:{port}", basic_auth=("elastic", "*pwASJfphV27RFS=BSWH"))
+@lru_cache(maxsize=None)
+def get_client(host="localhost", port=9200):
+    # connect with scheme; one pooled client per host, reused across queries
+    return Elasticsearch(f"http://{host}:{port}", basic_auth=("elastic", "*pwASJfphV27RFS=BSWH"))
 
-    # fetch embedding dim
+
+def embedding_dims(es, index, field="Embedding"):
+    # fetch embedding dim (index may be an alias, so key by the backing index)
     mapping = es.indices.get_mapping(index=index)
-    dims = mapping[index]["mappings"]["properties"]["Embedding"]["dims"]
-    if len(embedding) != dims:
-        raise ValueError(
-            f"Dimension mismatch: got {len(embedding)}, expected {dims}")
-    body = {
+    return next(iter(mapping.values()))["mappings"]["properties"][field]["dims"]
+
+
+def index_version(index="chat_embeddings", host="localhost", port=9200):
+    # Identity of the concrete index(es) behind `index` (name + uuid);
+    # changes whenever an alias swap or a delete/recreate happens
+    settings = get_client(host, port).indices.get_settings(index=index, name="index.uuid")
+    return ",".join(sorted(
+        f"{name}:{s['settings']['index']['uuid']}" for name, s in settings.items()))
+
+
+def _script_score_body(embedding, k):
+    return {
         "size": k,
         "query": {
             "script_score": {
@@ -24,6 +36,132 @@ def query_similar(embedding, k=5, index="chat_embeddings", host="localhost", por
             }
         }
     }
+
+
+def _knn_body(embedding, k, num_candidates):
+    # Approximate search over the HNSW graph (int8_hnsw when quantised)
+    return {
+        "size": k,
+        "knn": {
+            "field": "Embedding",
+            "query_vector": embedding,
+            "k": k,
+            "num_candidates": max(num_candidates, k),
+        }
+    }
+
+
+def _search_body(embedding, k, num_candidates):
+    if num_candidates is None:
+        return _script_score_body(embedding, k)
+    return _knn_body(embedding, k, num_candidates)
+
+
+def _hits(response, num_candidates):
+    hits = response["hits"]["hits"]
+    if num_candidates is not None:
+        # knn scores cosine as (1 + cos) / 2; rescale to the script_score range
+        for h in hits:
+            h["_score"] *= 2.0
+    return hits
+
+
+def query_similar(embedding, k=5, index="chat_embeddings", host="localhost", port=9200,
+                  num_candidates=None):
+    """
+    Top-k documents by cosine similarity on Embedding, scored cos + 1.
+    Exact brute-force script_score by default; with `num_candidates` an
+    approximate knn search over the HNSW graph, which is the only path that
+    uses the index's (int8_hnsw) vector index.
+    """
+    es = get_client(host, port)
+
+    dims = embedding_dims(es, index)
+    if len(embedding) != dims:
+        raise ValueError(
+            f"Dimension mismatch: got {len(embedding)}, expected {dims}")
+    body = _search_body(embedding, k, num_candidates)
+    return _hits(es.search(index=index, body=body), num_candidates)
+
+
+def query_similar_batch(embeddings, k=5, index="chat_embeddings", host="localhost", port=9200,
+                        batch_size=100, num_candidates=None):
+    """
+    Runs one similarity search per embedding, `batch_size` searches per
+    _msearch round trip. The mapping is read once for the whole batch.
+    `num_candidates` switches to knn search as in query_similar.
+    Returns a list of hit lists, aligned with `embeddings`.
+    """
+    embeddings = [list(map(float, e)) for e in embeddings]
+    if not embeddings:
+        return []
+    es = get_client(host, port)
+
+    dims = embedding_dims(es, index)
+    for e in embeddings:
+        if len(e) != dims:
+            raise ValueError(
+                f"Dimension mismatch: got {len(e)}, expected {dims}")
+
+    results = []
+    for start in range(0, len(embeddings), batch_size):
+        searches = []
+        for e in embeddings[start:start + batch_size]:
+            searches.append({"index": index})
+            searches.append(_search_body(e, k, num_candidates))
+        for r in es.msearch(searches=searches)["responses"]:
+            if "error" in r:
+                raise RuntimeError(f"msearch failed: {r['error']}")
+            results.append(_hits(r, num_candidates))
+    return results
+
+
+def entity_vocabulary(fields=("products", "services", "issue_types"), size=5000,
+                      index="chat_embeddings", host="localhost", port=9200):
+    # Distinct entity strings stored in the index, per Entities sub-field
+    # (terms aggregation over the dynamic `.keyword` sub-fields)
+    es = get_client(host, port)
+    body = {
+        "size": 0,
+        "aggs": {
+            f: {"terms": {"field": f"Entities.{f}.keyword", "size": size}} for f in fields
+        }
+    }
+    aggs = es.search(index=index, body=body)["aggregations"]
+    return {f: [b["key"] for b in aggs[f]["buckets"]] for f in fields}
+
+
+def query_similar_multi(intent_embedding, conversation_embedding, weights=(0.5, 0.5), k=5,
+                        index="chat_embeddings", host="localhost", port=9200):
+    # Weighted sum of per-field cosine similarities over the separately stored
+    # intent and conversation vectors, so the mix can be re-tuned per query
+    es = get_client(host, port)
+    w_intent, w_conv = weights
+    body = {
+        "size": k,
+        "query": {
+            "script_score": {
+                "query": {"bool": {"filter": [
+                    {"exists": {"field": "Intent_Embedding"}},
+                    {"exists": {"field": "Conversation_Embedding"}},
+                ]}},
+                "script": {
+                    # Shifted by the weight sum to ensure non-negativity
+                    "source": (
+                        "params.w_intent * cosineSimilarity(params.q_intent, 'Intent_Embedding')"
+                        " + params.w_conv * cosineSimilarity(params.q_conv, 'Conversation_Embedding')"
+                        " + params.w_intent + params.w_conv"
+                    ),
+                    "params": {
+                        "q_intent": intent_embedding,
+                        "q_conv": conversation_embedding,
+                        "w_intent": float(w_intent),
+                        "w_conv": float(w_conv),
+                    }
+                }
+            }
+        }
+    }
     return es.search(index=index, body=body)["hits"]["hits"]
 
 
@@ -0,0 +1,12 @@
+import json
+import hashlib
+
+
+def entity_signature(doc):
+    """
+    Stable hash of a document's (Entities, Relationships) pair.
+    Stored at index time so retrieval can dedup hits without re-serialising;
+    documents indexed without one get the same value at query time.
+    """
+    key = json.dumps([doc.get("Entities"), doc.get("Relationships")], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
@@ -1,9 +1,15 @@
 import re
 import ast
 import json
-import pandas as pd
+import time
+import argparse
 from elasticsearch import Elasticsearch, helpers
-from elasticsearch.helpers import BulkIndexError
+from openpyxl import load_workbook
+
+try:  # imported as part of the package or run as a script
+    from .signature import entity_signature
+except ImportError:
+    from signature import entity_signature
 
 
 def parse_string(s):
@@ -29,60 +35,246 @@ def parse_string(s):
     return data
 
 
-def main():
-    # Read Excel (raw strings in first column)
-    df = pd.read_excel("C:\\Users\\paris\\Documents\\GitHub\\427-project\\VirginAmerica_Embedding.xlsx")
+def iter_documents(path):
+    """
+    Lazily yields parsed documents from the first column of an embedding
+    Excel file (as written by DatabaseStructure.convertExcel).
+    The workbook is opened read-only so rows are streamed, not loaded at once.
+    """
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(min_row=2, max_col=1, values_only=True)
+        for (raw,) in rows:
+            if not raw:
+                continue
+            try:
+                doc = parse_string(raw)
+            except Exception as e:
+                print("Parse error, skipping row:", e)
+                continue
+            doc.setdefault("Signature", entity_signature(doc))
+            yield doc
+    finally:
+        wb.close()
 
-    # Connect to Elasticsearch
-    es = Elasticsearch(
-        "http://localhost:9200",
-        basic_auth=("elastic", "*pwASJfphV27RFS=BSWH")
-)
-    index = "chat_embeddings"
 
-    # Determine embedding dimension
-    first_doc = parse_string(df.iloc[0, 0])
-    dims = len(first_doc["Embedding"])
+VECTOR_FIELDS = ("Embedding", "Intent_Embedding", "Conversation_Embedding")
 
-    # Delete and recreate index with object mapping for Entities & Relationships
-    if es.indices.exists(index=index):
-        es.indices.delete(index=index)
+
+def doc_id(doc, id_prefix=""):
+    # Stable _id so re-running the indexer upserts instead of duplicating
+    return f"{id_prefix}{doc['ChatID']}"
+
+
+def index_mapping(dims, quantize=None, exclude_vectors=False):
+    """
+    Object mapping for Entities & Relationships, dense vector for Embedding.
+
+    Intent_Embedding / Conversation_Embedding hold the two halves of
+    Embedding separately for weighted multi-vector scoring.
+
+    quantize="int8" stores the HNSW graph with int8 scalar-quantised vectors
+    (int8_hnsw). Only knn searches use that graph (query_similar with
+    num_candidates, QAPipeline(knn_candidates=...)); exact script_score
+    still reads the float vectors. exclude_vectors drops the vectors from
+    _source so they are not duplicated as JSON float lists.
+    """
+    embedding = {
+        "type":       "dense_vector",
+        "dims":       dims,
+        "index":      True,
+        "similarity": "cosine"
+    }
+    if quantize == "int8":
+        embedding["index_options"] = {"type": "int8_hnsw"}
+    elif quantize is not None:
+        raise ValueError(f"Unsupported quantization: {quantize!r}")
 
     mapping = {
         "mappings": {
-            "properties": { 
+            "properties": {
                 "ChatID":               {"type": "keyword"},
                 "Company_name":         {"type": "text"},
                 "Conversation_History": {"type": "object"},
                 "Entities":             {"type": "object"},
                 "Relationships":        {"type": "object"},
-                "Embedding": {
-                    "type":       "dense_vector",
-                    "dims":       dims,
-                    "index":      True,
-                    "similarity": "cosine"
-                }
+                "Signature":            {"type": "keyword"},
+                "Embedding":            embedding,
+                "Intent_Embedding":       dict(embedding),
+                "Conversation_Embedding": dict(embedding),
             }
         }
     }
-    es.indices.create(index=index, body=mapping)
-
-    # Prepare bulk actions
-    actions = []
-    for raw in df.iloc[:, 0]:
-        try:
-            doc = parse_string(raw)
-        except Exception as e:
-            print("Parse error, skipping row:", e)
-            continue
-        actions.append({"_index": index, "_source": doc})
-
-    # Bulk index documents
-    try:
-        helpers.bulk(es, actions)
-        print("Bulk indexing completed successfully.")
-    except BulkIndexError as e:
-        print("Bulk index failures:", e.errors)
+    if exclude_vectors:
+        mapping["mappings"]["_source"] = {"excludes": list(VECTOR_FIELDS)}
+    return mapping
+
+
+def generate_actions(docs, index, id_prefix=""):
+    for doc in docs:
+        yield {
+            "_op_type": "index",
+            "_index":   index,
+            "_id":      doc_id(doc, id_prefix),
+            "_source":  doc,
+        }
+
+
+def stream_index(es, docs, index, chunk_size=500, thread_count=4, id_prefix=""):
+    """
+    Indexes an iterable of documents with helpers.parallel_bulk
+    (helpers.streaming_bulk when thread_count <= 1).
+
+    Nothing is materialised in memory beyond the in-flight chunks.
+    Returns a dict with the number of indexed / failed documents (the
+    helpers also split requests by max_chunk_bytes, so no per-chunk
+    breakdown is reported).
+    """
+    actions = generate_actions(docs, index, id_prefix)
+    if thread_count > 1:
+        results = helpers.parallel_bulk(
+            es, actions,
+            chunk_size=chunk_size,
+            thread_count=thread_count,
+            raise_on_error=False,
+            raise_on_exception=False,
+        )
+    else:
+        results = helpers.streaming_bulk(
+            es, actions,
+            chunk_size=chunk_size,
+            raise_on_error=False,
+            raise_on_exception=False,
+        )
+
+    stats = {"indexed": 0, "failed": 0}
+    for ok, item in results:
+        if ok:
+            stats["indexed"] += 1
+        else:
+            stats["failed"] += 1
+            print("Index failure:", item)
+    return stats
+
+
+def current_indices(es, alias):
+    # Concrete indices the alias points to (empty if it does not exist yet)
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias).keys())
+
+
+def build_versioned_index(es, docs, alias, dims, chunk_size=500, thread_count=4,
+                          id_prefix="", replicas=1, keep_old=False,
+                          quantize=None, exclude_vectors=False):
+    """
+    Zero-downtime rebuild:
+    - writes into a fresh `<alias>_v<timestamp>` index with refresh disabled
+      and no replicas while bulk loading
+    - restores refresh/replicas, refreshes and force-merges the new index
+    - atomically moves the alias from the old index(es) to the new one
+
+    Queries keep hitting the old index through the alias until the swap.
+    If any document fails to index, the half-built index is deleted, the
+    alias and old index are left untouched and a RuntimeError is raised.
+    Returns the name of the new index.
+    """
+    old = current_indices(es, alias)
+    if not old and es.indices.exists(index=alias):
+        # A plain index still owns the alias name (pre-alias layout)
+        raise RuntimeError(
+            f"'{alias}' is a concrete index; delete it (helper.delete_index) before the first alias swap.")
+
+    new_index = f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+    body = index_mapping(dims, quantize, exclude_vectors)
+    body["settings"] = {"index": {"refresh_interval": "-1", "number_of_replicas": 0}}
+    es.indices.create(index=new_index, body=body)
+    print(f"Created index '{new_index}' for rebuild.")
+
+    stats = stream_index(es, docs, new_index, chunk_size, thread_count, id_prefix)
+    print(f"Bulk load finished: indexed={stats['indexed']} failed={stats['failed']}")
+    if stats["failed"]:
+        es.indices.delete(index=new_index)
+        raise RuntimeError(
+            f"{stats['failed']} documents failed to index; deleted '{new_index}', "
+            f"alias '{alias}' still points to {old or 'nothing'}.")
+
+    es.indices.put_settings(
+        index=new_index,
+        body={"index": {"refresh_interval": "1s", "number_of_replicas": replicas}},
+    )
+    es.indices.refresh(index=new_index)
+    es.indices.forcemerge(index=new_index, max_num_segments=1, request_timeout=600)
+
+    actions = [{"remove": {"index": i, "alias": alias}} for i in old]
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    es.indices.update_aliases(body={"actions": actions})
+    print(f"Alias '{alias}' -> '{new_index}' (was {old or 'unset'}).")
+
+    if not keep_old:
+        for i in old:
+            es.indices.delete(index=i)
+            print(f"Deleted old index '{i}'.")
+    return new_index
+
+
+def main():
+    p = argparse.ArgumentParser(description="Stream chat embeddings into Elasticsearch.")
+    p.add_argument("path", help="Embedding Excel produced by DatabaseStructure.convertExcel")
+    p.add_argument("--index", default="chat_embeddings", help="Alias that queries target")
+    p.add_argument("--chunk-size", type=int, default=500, help="Documents per bulk request")
+    p.add_argument("--threads", type=int, default=4, help="parallel_bulk worker threads (1 = streaming_bulk)")
+    p.add_argument("--id-prefix", default="", help="Prefix for _id when several sources share one index")
+    p.add_argument("--rebuild", action="store_true",
+                   help="Build a new versioned index and swap the alias instead of upserting")
+    p.add_argument("--replicas", type=int, default=1, help="Replica count restored after a rebuild")
+    p.add_argument("--keep-old", action="store_true", help="Keep the previous index after the alias swap")
+    p.add_argument("--quantize", choices=["int8"], default=None,
+                   help="Index vectors with int8_hnsw for knn search (applies to rebuilds)")
+    p.add_argument("--exclude-vectors", action="store_true",
+                   help="Exclude Embedding from _source (applies to rebuilds)")
+    args = p.parse_args()
+
+    # Connect to Elasticsearch
+    es = Elasticsearch(
+        "http://localhost:9200",
+        basic_auth=("elastic", "*pwASJfphV27RFS=BSWH")
+)
+
+    # Determine embedding dimension from the first parsable document
+    docs = iter_documents(args.path)
+    first_doc = next(docs, None)
+    if first_doc is None:
+        print("No documents found.")
+        return
+    dims = len(first_doc["Embedding"])
+
+    def _all_docs():
+        yield first_doc
+        yield from docs
+
+    # First run (nothing behind the name yet) always goes through a versioned build
+    if args.rebuild or not es.indices.exists(index=args.index):
+        build_versioned_index(
+            es, _all_docs(), args.index, dims,
+            chunk_size=args.chunk_size,
+            thread_count=args.threads,
+            id_prefix=args.id_prefix,
+            replicas=args.replicas,
+            keep_old=args.keep_old,
+            quantize=args.quantize,
+            exclude_vectors=args.exclude_vectors,
+        )
+        return
+
+    # Incremental upsert through the alias (or a legacy plain index)
+    stats = stream_index(
+        es, _all_docs(), args.index,
+        chunk_size=args.chunk_size,
+        thread_count=args.threads,
+        id_prefix=args.id_prefix,
+    )
+    print(f"Bulk indexing finished: indexed={stats['indexed']} failed={stats['failed']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+Micro‑batching
+==============
+Coalesces model calls from concurrent requests into one forward pass.
+
+▪ :class:`MicroBatcher` runs a batch function on a background thread. A
+  caller submits one item and blocks on its result; the worker waits at
+  most ``max_wait_ms`` after the first item for others to join, up to
+  ``max_batch_size`` items, then runs them together.
+▪ :class:`BatchedEncoder` and :class:`BatchedReranker` are drop‑in
+  stand‑ins for the sentence‑transformer (``model.encode``) and
+  :class:`CrossEncoderReranker` (``score``) used by :class:`QAPipeline`.
+
+A lone request pays at most ``max_wait_ms`` extra; under load, N
+concurrent requests share one padded batch instead of running N tiny ones.
+
+Usage
+-----
+>>> pipeline = QAPipeline(micro_batching=True, batch_wait_ms=2.0)
+>>> pipeline.db.model.stats()["mean_batch_size"]
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects single items from many threads and processes them in batches.
+
+    ``batch_fn`` receives a list of items and must return one result per
+    item, in the same order. If it raises, every caller in that batch gets
+    the exception.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        name: str = "micro-batcher",
+    ) -> None:
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._counts = {"batches": 0, "items": 0, "max_batch_size": 0}
+        self._worker = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._worker.start()
+
+    # ── Public API ────────────────────────────────────────────────────────── #
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item: Any) -> Any:
+        """Submit *item* and wait for its result."""
+        return self.submit(item).result()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            batches = self._counts["batches"]
+            return {
+                **self._counts,
+                "mean_batch_size": self._counts["items"] / batches if batches else 0.0,
+            }
+
+    # ── Internal helpers ──────────────────────────────────────────────────── #
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+            except Exception as exc:
+                for _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+            with self._lock:
+                self._counts["batches"] += 1
+                self._counts["items"] += len(batch)
+                self._counts["max_batch_size"] = max(self._counts["max_batch_size"], len(batch))
+
+
+class BatchedEncoder:
+    """``encode`` proxy for a sentence‑transformer that micro‑batches calls.
+
+    Calls are grouped by their keyword arguments (e.g.
+    ``normalize_embeddings``); each group is one ``encode`` of all texts.
+    Other attributes are forwarded to the wrapped model.
+    """
+
+    def __init__(self, model: Any, max_batch_size: int = 32, max_wait_ms: float = 2.0) -> None:
+        self.model = model
+        self._batcher = MicroBatcher(self._encode_batch, max_batch_size, max_wait_ms, name="encode-batcher")
+
+    def encode(self, sentences: str | List[str], **kwargs: Any) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vecs = self._batcher((texts, tuple(sorted(kwargs.items()))))
+        return vecs[0] if single else vecs
+
+    def stats(self) -> Dict[str, float]:
+        return self._batcher.stats()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    def _encode_batch(self, requests: List[Tuple[List[str], tuple]]) -> List[np.ndarray]:
+        results: List[Any] = [None] * len(requests)
+        groups: Dict[tuple, List[int]] = {}
+        for i, (_, kwargs) in enumerate(requests):
+            groups.setdefault(kwargs, []).append(i)
+        for kwargs, idx in groups.items():
+            texts = [t for i in idx for t in requests[i][0]]
+            vecs = self.model.encode(texts, **dict(kwargs))
+            start = 0
+            for i in idx:
+                n = len(requests[i][0])
+                results[i] = vecs[start:start + n]
+                start += n
+        return results
+
+
+class BatchedReranker:
+    """``score`` proxy for :class:`CrossEncoderReranker` that micro‑batches calls.
+
+    Candidates of concurrent requests are scored together through
+    ``score_pairs``, so they share length‑bucketed forward passes. Other
+    attributes (``tokenizer``, ``cache``, ``rerank`` …) are forwarded, for
+    reads and writes.
+    """
+
+    def __init__(self, reranker: Any, max_batch_size: int = 32, max_wait_ms: float = 2.0) -> None:
+        self.reranker = reranker
+        self._batcher = MicroBatcher(self._score_batch, max_batch_size, max_wait_ms, name="rerank-batcher")
+
+    def score(self, query: str, candidates: List[str]) -> List[float]:
+        if not candidates:
+            return []
+        return self._batcher((query, list(candidates)))
+
+    def stats(self) -> Dict[str, float]:
+        return self._batcher.stats()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.reranker, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # e.g. ``pipeline.reranker.cache = None`` must reach the wrapped reranker
+        if name in ("reranker", "_batcher"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.reranker, name, value)
+
+    def _score_batch(self, requests: List[Tuple[str, List[str]]]) -> List[List[float]]:
+        queries = [q for q, cands in requests for _ in cands]
+        candidates = [c for _, cands in requests for c in cands]
+        scores = self.reranker.score_pairs(queries, candidates)
+        results, start = [], 0
+        for _, cands in requests:
+            results.append(scores[start:start + len(cands)])
+            start += len(cands)
+        return results
@@ -0,0 +1,236 @@
+"""
+e2e_benchmark.py
+----------------
+Offline end-to-end benchmark of every pipeline component on the TWCS
+sample, with no OpenAI or Elasticsearch:
+
+- twcs_processor   TWCSProcessor cleaning + structuring, per conversation
+- llm_extractor    LLMExtractor.extract_one with the deterministic stub LLM
+- db_structure     DatabaseStructure.convertExcel (embeddings + export)
+- load_store       LocalVectorStore.from_excel on that export
+- query_embed      query embedding (sentence-transformer)
+- retriever        LocalVectorStore.query_similar, per query
+- reranker         CrossEncoderReranker.score over the retrieved candidates
+- qa_pipeline      QAPipeline.run_with_details (stub LLM + local store)
+
+For each stage: calls, throughput (calls/s), p50 / p95 latency and peak
+RSS while the stage ran. QAPipeline's own per-stage histograms are included.
+Results go to `Py_files/bench/results/e2e_<commit>.json`; pass `--compare`
+with another results file (or commit) to print the deltas.
+
+    python Py_files/bench/e2e_benchmark.py --queries 30
+    python Py_files/bench/e2e_benchmark.py --compare 1a2b3c4
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from Py_files.QA_Pipeline import QAPipeline
+from Py_files.llm_pipeline.llm_extractor import LLMExtractor
+from Py_files.llm_pipeline.reranker import CrossEncoderReranker
+from Py_files.llm_pipeline.twcs_processor import TWCSProcessor
+from Py_files.VectorDBStructure.db_structure import DatabaseStructure
+from Py_files.VectorDBStructure.local_store import LocalVectorStore
+from stubs import StubLLMClient
+
+SAMPLE = ROOT.parent / "data/processed/sample/twcs_structured_UniqueCount-10_time-20250330-1246.xlsx"
+TEST_SET = ROOT.parent / "data/processed/test_data/airway_test_data.xlsx"
+RESULTS = Path(__file__).resolve().parent / "results"
+
+
+# ── Measurement ───────────────────────────────────────────────────────────── #
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # no procfs (macOS): lifetime peak, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextmanager
+def peak_rss(interval: float = 0.01):
+    """Samples RSS on a background thread; ``result["peak"]`` is the max seen."""
+    result = {"peak": _rss_bytes()}
+    stop = threading.Event()
+
+    def _sample() -> None:
+        while not stop.wait(interval):
+            result["peak"] = max(result["peak"], _rss_bytes())
+
+    sampler = threading.Thread(target=_sample, daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        sampler.join()
+        result["peak"] = max(result["peak"], _rss_bytes())
+
+
+def measure(fn: Callable[[Any], Any], items: Iterable[Any]) -> tuple[dict, list]:
+    """Calls ``fn`` once per item; returns (stats, outputs)."""
+    outputs, times = [], []
+    with peak_rss() as rss:
+        t_start = time.perf_counter()
+        for item in items:
+            t0 = time.perf_counter()
+            outputs.append(fn(item))
+            times.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - t_start
+    ms = np.array(times) * 1000
+    stats = {
+        "calls": len(times),
+        "wall_s": wall,
+        "throughput_per_s": len(times) / wall if wall else 0.0,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "peak_rss_mb": rss["peak"] / 2**20,
+    }
+    return stats, outputs
+
+
+# ── Results ───────────────────────────────────────────────────────────────── #
+
+def git_commit() -> str:
+    def _git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+
+    sha = _git("rev-parse", "--short", "HEAD") or "unknown"
+    return f"{sha}-dirty" if _git("status", "--porcelain", "--untracked-files=no") else sha
+
+
+def load_results(ref: str) -> dict:
+    path = Path(ref)
+    if not path.exists():
+        path = RESULTS / f"e2e_{ref}.json"
+    return json.loads(path.read_text())
+
+
+def print_table(stages: dict, baseline: dict | None = None) -> None:
+    print(f"{'stage':<16}{'calls':>7}{'per s':>10}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}")
+    for name, s in stages.items():
+        line = (f"{name:<16}{s['calls']:>7}{s['throughput_per_s']:>10.1f}"
+                f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['peak_rss_mb']:>10.0f}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f"   p50 {s['p50_ms'] / base['p50_ms'] - 1:+.0%}  p95 {s['p95_ms'] / base['p95_ms'] - 1:+.0%}"
+        print(line)
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────── #
+
+def run(args: argparse.Namespace) -> dict:
+    sample = pd.read_excel(SAMPLE)
+    sample = pd.concat([sample] * args.repeat, ignore_index=True)
+    queries = pd.read_excel(TEST_SET)["Conversation"].dropna().astype(str).tolist()[:args.queries]
+    llm = StubLLMClient(latency_ms=args.llm_latency_ms)
+    stages: dict[str, dict] = {}
+
+    # 1) Cleaning + structuring (per conversation)
+    rows = list(zip(sample["cleaned_conversations"], sample["company_name"]))
+    stages["twcs_processor"], structured = measure(
+        lambda r: TWCSProcessor._to_structured(TWCSProcessor._clean_single(r[0]), r[1]), rows)
+
+    # 2) Entity / relationship extraction (stub LLM)
+    extractor = LLMExtractor(dataframe=sample, client=llm)
+    stages["llm_extractor"], extracted = measure(extractor.extract_one, structured)
+    sample["structured_conversations"] = [json.dumps(s) for s in structured]
+    sample["entities"] = [e for e, _ in extracted]
+    sample["relationship"] = [r for _, r in extracted]
+
+    # 3) Embedding + export, then load into the local store
+    with tempfile.TemporaryDirectory() as tmp:
+        export = Path(tmp) / "embeddings.xlsx"
+        db = DatabaseStructure(sample)
+        stages["db_structure"], _ = measure(lambda _: db.convertExcel(export), [None])
+        stages["load_store"], (store,) = measure(lambda _: LocalVectorStore.from_excel(export), [None])
+
+    # 4) Retrieval and reranking, per query
+    stages["query_embed"], vectors = measure(
+        lambda q: db.model.encode(q, normalize_embeddings=True), queries)
+    stages["retriever"], hits = measure(lambda v: store.query_similar(v, k=args.es_top_k), vectors)
+    reranker = CrossEncoderReranker(cache_size=0)
+    stages["reranker"], _ = measure(
+        lambda qh: reranker.score(qh[0], [h["_source"]["Conversation_History"]["conversation"] for h in qh[1]]),
+        list(zip(queries, hits)),
+    )
+
+    # 5) Full pipeline (stub LLM + local store)
+    pipeline = QAPipeline(
+        es_top_k=args.es_top_k,
+        rerank_top_k=args.es_top_k,
+        parallel=not args.serial,
+        llm_client=llm,
+        retriever=store,
+    )
+    pipeline.run_with_details(queries[0])  # warm-up
+    pipeline.tracer.reset()
+    stages["qa_pipeline"], _ = measure(pipeline.run_with_details, queries)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": vars(args),
+        "documents": len(store),
+        "queries": len(queries),
+        "stages": stages,
+        "qa_pipeline_stages": {
+            name: {k: v for k, v in h.items() if k != "buckets"}
+            for name, h in pipeline.tracer.histograms().items()
+        },
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--queries", type=int, default=30, help="Test-set queries to run")
+    p.add_argument("--repeat", type=int, default=5, help="Replicate the sample to get a bigger corpus")
+    p.add_argument("--es-top-k", type=int, default=50)
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per stub LLM call")
+    p.add_argument("--serial", action="store_true", help="Run QAPipeline with parallel=False")
+    p.add_argument("--compare", default=None, help="Results file or commit to compare against")
+    p.add_argument("--no-save", action="store_true")
+    args = p.parse_args()
+
+    compare = args.compare
+    baseline = load_results(compare)["stages"] if compare else None
+    results = run(args)
+
+    print(f"commit {results['commit']}  documents {results['documents']}  queries {results['queries']}\n")
+    print_table(results["stages"], baseline)
+    print("\nQAPipeline stages (ms):")
+    for name, h in results["qa_pipeline_stages"].items():
+        print(f"- {name:<22} p50 {h['p50_ms']:>8.1f}  p95 {h['p95_ms']:>8.1f}  n={h['count']}")
+
+    if not args.no_save:
+        RESULTS.mkdir(exist_ok=True)
+        out = RESULTS / f"e2e_{results['commit']}.json"
+        out.write_text(json.dumps(results, indent=2))
+        print(f"\nSaved {out}")
+
+
+if __name__ == "__main__":
+    main()
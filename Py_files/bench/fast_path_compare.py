@@ -0,0 +1,90 @@
+"""
+fast_path_compare.py
+--------------------
+Latency and retrieval agreement of QAPipeline's query-time intent modes
+(`extraction="llm" | "keywords" | "none"`) on the airway test set.
+
+Only the retrieval half of the pipeline runs (no final answer call). The
+LLM path is the reference: for the fast paths we report how many of its
+top-n ChatIDs they also select (overlap@n) and whether the best hit matches.
+Every mode starts each query with an empty reranker pair cache, so no mode
+is timed on scores another one paid for.
+
+Needs OPENAI_API_KEY and a running Elasticsearch with `chat_embeddings`,
+unless `--stub-llm` / `--local-store` are given.
+
+    python Py_files/bench/fast_path_compare.py --limit 50
+    python Py_files/bench/fast_path_compare.py --stub-llm --local-store VirginAmerica_Embedding.xlsx
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from Py_files.QA_Pipeline import QAPipeline
+from Py_files.llm_pipeline.reranker import ScoreCache
+
+TEST_SET = ROOT.parent / "data/processed/test_data/airway_test_data.xlsx"
+MODES = ("llm", "keywords", "none")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--limit", type=int, default=None, help="Only use the first N test queries")
+    p.add_argument("--top-n", type=int, default=5)
+    p.add_argument("--stub-llm", action="store_true", help="Deterministic stub instead of OpenAI")
+    p.add_argument("--local-store", default=None, help="Embedding Excel for LocalVectorStore instead of ES")
+    args = p.parse_args()
+
+    queries = pd.read_excel(TEST_SET)["Conversation"].dropna().astype(str).tolist()[: args.limit]
+    kwargs = {}
+    if args.stub_llm:
+        from stubs import StubLLMClient
+
+        kwargs["llm_client"] = StubLLMClient()
+    if args.local_store:
+        from Py_files.VectorDBStructure.local_store import LocalVectorStore
+
+        kwargs["retriever"] = LocalVectorStore.from_excel(args.local_store)
+    pipe = QAPipeline(**kwargs)
+    cache = pipe.reranker.cache
+
+    latency = {m: [] for m in MODES}
+    chat_ids = {m: [] for m in MODES}
+    for q in queries:
+        for mode in MODES:
+            pipe.extraction = mode
+            if cache is not None:  # fresh pair cache so no mode reuses another's rerank scores
+                pipe.reranker.cache = ScoreCache(cache.model_name, cache.max_size)
+            t0 = time.perf_counter()
+            details = pipe.prepare(q, args.top_n)
+            latency[mode].append((time.perf_counter() - t0) * 1000)
+            chat_ids[mode].append(details["chat_ids"])
+
+    print(f"{len(queries)} queries, top-{args.top_n}\n")
+    print(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'overlap@n':>11}{'top1 =':>8}")
+    for mode in MODES:
+        ms = np.array(latency[mode])
+        overlap = np.mean([
+            len(set(ref) & set(got)) / max(len(ref), 1)
+            for ref, got in zip(chat_ids["llm"], chat_ids[mode])
+        ])
+        top1 = np.mean([
+            bool(ref) and bool(got) and ref[0] == got[0]
+            for ref, got in zip(chat_ids["llm"], chat_ids[mode])
+        ])
+        print(f"{mode:<10}{np.percentile(ms, 50):>10.0f}{np.percentile(ms, 95):>10.0f}{overlap:>11.3f}{top1:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
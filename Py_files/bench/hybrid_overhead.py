@@ -0,0 +1,129 @@
+"""
+hybrid_overhead.py
+------------------
+Per-query overhead of the post-rerank stage of QAPipeline (hybrid scoring,
+diverse top-k selection, payload building) on 50 synthetic hits, next to the
+previous pandas / StandardScaler / iterrows implementation.
+
+    python Py_files/bench/hybrid_overhead.py --queries 2000
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from Py_files.QA_Pipeline import QAPipeline
+
+PRODUCTS = ["travel bank", "boarding pass", "seat upgrade", "promo code", "gift card", "wifi pass"]
+ISSUES = ["payment declined", "double charge", "refund request", "login failure", "late flight"]
+
+
+def make_hits(rng: np.random.Generator, n: int = 50) -> list[dict]:
+    hits = []
+    for i in range(n):
+        entities = {
+            "products": list(rng.choice(PRODUCTS, size=rng.integers(0, 3), replace=False)),
+            "services": [],
+            "issue_types": list(rng.choice(ISSUES, size=rng.integers(1, 3), replace=False)),
+        }
+        hits.append({
+            "_id": str(i),
+            "_score": float(1.5 + rng.random() * 0.3),
+            "_source": {
+                "ChatID": str(i),
+                "Company_name": "VirginAmerica",
+                "Conversation_History": {"conversation": (
+                    "Customer my card keeps getting declined when booking\n"
+                    "Company Sorry about that please DM us your confirmation code"
+                )},
+                "Entities": entities,
+                "Relationships": [],
+            },
+        })
+    return hits
+
+
+def numpy_stage(pipe: QAPipeline, hits: list[dict], scores: np.ndarray) -> str:
+    order, _ = pipe._hybrid_rank(hits, scores)
+    picks = pipe._select_diverse_topk(hits, order, k=5)
+    return pipe._build_payload([hits[i] for i in picks], "my card is declined")
+
+
+def pandas_stage(pipe: QAPipeline, hits: list[dict], scores: np.ndarray) -> str:
+    # Reference: the implementation this stage replaced
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    rows = []
+    for h, s in zip(hits, scores):
+        src = h["_source"]
+        rows.append({
+            "similarity_score": h["_score"], "rerank_score": s,
+            "Company_name": src["Company_name"],
+            "Conversation_History": src["Conversation_History"]["conversation"],
+            "Entities": json.dumps(src["Entities"]), "Relationships": json.dumps(src["Relationships"]),
+        })
+    df = pd.DataFrame(rows)
+    df[["sim_norm", "rerank_norm"]] = StandardScaler().fit_transform(
+        df[["similarity_score", "rerank_score"]].fillna(0))
+    df["hybrid_score"] = pipe.w_sim * df["sim_norm"] + pipe.w_rerank * df["rerank_norm"]
+    df = df.sort_values("hybrid_score", ascending=False)
+    seen, picks = set(), []
+    for _, row in df.iterrows():
+        key = (row["Entities"], row["Relationships"])
+        if key not in seen:
+            picks.append(row)
+            seen.add(key)
+        if len(picks) == 5:
+            break
+    results = [{
+        "company_name": r["Company_name"],
+        "conversation": pipe._parse_conversation(r["Conversation_History"]),
+        "intents": json.loads(r["Entities"]),
+        "relationships": json.loads(r["Relationships"]),
+    } for r in picks]
+    return json.dumps({"query": "my card is declined", "retrieved_answers": results}, ensure_ascii=False, indent=2)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--queries", type=int, default=2000)
+    args = p.parse_args()
+
+    # Only the scoring attributes are needed – skip model / client loading
+    pipe = QAPipeline.__new__(QAPipeline)
+    pipe.w_sim, pipe.w_rerank = 0.7, 0.3
+    pipe.payload_token_budget = None
+    pipe._encode, pipe._decode = str.split, " ".join  # whitespace tokens: no model download
+
+    rng = np.random.default_rng(0)
+    workload = [(make_hits(rng), rng.normal(size=50)) for _ in range(50)]
+
+    stages = {"numpy": numpy_stage}
+    try:
+        import sklearn  # noqa: F401
+        stages["pandas (previous)"] = pandas_stage
+    except ImportError:
+        print("scikit-learn not installed – skipping the pandas reference\n")
+
+    for name, fn in stages.items():
+        t0 = time.perf_counter()
+        for i in range(args.queries):
+            hits, scores = workload[i % len(workload)]
+            fn(pipe, hits, scores)
+        per_query = (time.perf_counter() - t0) / args.queries * 1e6
+        print(f"{name:<18} {per_query:>10.1f} µs / query")
+
+
+if __name__ == "__main__":
+    main()
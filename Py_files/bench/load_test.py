@@ -0,0 +1,261 @@
+"""
+load_test.py
+------------
+Load generator for QAPipeline, in-process or through the HTTP service
+(`serve.py`). Replays the example prompts of `generate_queries.py` plus
+the airway test set, and sweeps either
+
+- concurrency (closed loop): N workers each send the next query as soon
+  as the previous one returns, or
+- arrival rate (open loop): queries arrive as a Poisson process at R/s,
+  whatever the response times; latency is measured from the scheduled
+  arrival, so queueing delay is included.
+
+Queries are cycled, so verbatim repeats would be answered from the
+semantic / reranker caches and throughput would be inflated. Every replayed
+query therefore gets a running `(#n)` suffix, so caches miss as they would
+on fresh traffic while the pipeline keeps its production configuration.
+`--repeat-queries` replays the texts verbatim (warm-cache numbers);
+`--no-rerank-cache` runs the in-process pipeline without its reranker pair
+cache (cold rerank cost on every query).
+
+Per configuration it reports throughput, p50/p95/p99/max latency and error
+rate, then the saturation point: the first configuration where more load
+stops buying throughput (closed loop: < 10 % more throughput for > 50 %
+more p95) or the box falls behind (open loop: < 90 % of the offered rate
+completed, or > 1 % errors).
+
+    python Py_files/bench/load_test.py --concurrency 1 2 4 8 16 --duration 30
+    python Py_files/bench/load_test.py --target http://localhost:8000 --rate 1 2 5 10
+    python Py_files/bench/load_test.py --stub-llm --local-store VirginAmerica_Embedding.xlsx
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+import argparse
+import ast
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+TEST_SET = ROOT.parent / "data/processed/test_data/airway_test_data.xlsx"
+GENERATE_QUERIES = ROOT / "VectorDBStructure/generate_queries.py"
+
+
+# ── Workload ──────────────────────────────────────────────────────────────── #
+
+def example_prompts() -> list[str]:
+    # Read PROMPTS without importing the script (it pulls in ES + the encoder)
+    tree = ast.parse(GENERATE_QUERIES.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "PROMPTS" for t in node.targets):
+            return list(ast.literal_eval(node.value))
+    return []
+
+
+def load_queries(limit: int | None = None) -> list[str]:
+    queries = example_prompts()
+    if TEST_SET.exists():
+        queries += pd.read_excel(TEST_SET)["Conversation"].dropna().astype(str).tolist()
+    return queries[:limit] if limit else queries
+
+
+def query_stream(queries: list[str], unique: bool) -> Iterator[str]:
+    # Endless replay; with `unique` every query text is sent only once
+    for n, q in enumerate(itertools.cycle(queries)):
+        yield f"{q} (#{n})" if unique else q
+
+
+# ── Targets ───────────────────────────────────────────────────────────────── #
+
+def build_pipeline(args: argparse.Namespace):
+    from Py_files.QA_Pipeline import QAPipeline
+
+    kwargs = {"parallel": not args.serial, "micro_batching": args.micro_batching}
+    if args.stub_llm:
+        from stubs import StubLLMClient
+
+        kwargs["llm_client"] = StubLLMClient(latency_ms=args.llm_latency_ms)
+    if args.local_store:
+        from Py_files.VectorDBStructure.local_store import LocalVectorStore
+
+        kwargs["retriever"] = LocalVectorStore.from_excel(args.local_store)
+    return QAPipeline(**kwargs)
+
+
+def inproc_target(args: argparse.Namespace, pipeline=None) -> Callable[[str], None]:
+    # `pipeline` defaults to one built from the command-line options
+    pipeline = pipeline or build_pipeline(args)
+    if args.no_rerank_cache:
+        pipeline.reranker.cache = None  # every query pays for its rerank
+    return lambda q: pipeline.run_with_details(q, args.top_n)
+
+
+def http_target(args: argparse.Namespace) -> Callable[[str], None]:
+    url = args.target.rstrip("/") + "/query"
+
+    def _call(q: str) -> None:
+        body = json.dumps({"query": q, "top_n": args.top_n}).encode()
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=args.timeout) as resp:
+            resp.read()
+
+    return _call
+
+
+# ── Runners ───────────────────────────────────────────────────────────────── #
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+        self.errors: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def call(self, target: Callable[[str], None], query: str, start: float) -> None:
+        try:
+            target(query)
+        except Exception as exc:
+            key = f"HTTP {exc.code}" if isinstance(exc, urllib.error.HTTPError) else type(exc).__name__
+            with self._lock:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(elapsed)
+
+    def summary(self, wall: float, **config) -> dict:
+        ms = np.array(self.latencies) * 1000
+        n_err = sum(self.errors.values())
+        sent = len(ms) + n_err
+        pct = (lambda q: float(np.percentile(ms, q))) if len(ms) else (lambda q: float("nan"))
+        return {
+            **config,
+            "sent": sent,
+            "ok": len(ms),
+            "error_rate": n_err / sent if sent else 0.0,
+            "errors": dict(self.errors),
+            "throughput_per_s": len(ms) / wall if wall else 0.0,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+            "max_ms": float(ms.max()) if len(ms) else float("nan"),
+        }
+
+
+def closed_loop(target, stream: Iterator[str], concurrency: int, duration: float) -> dict:
+    rec = Recorder()
+    lock, deadline = threading.Lock(), time.perf_counter() + duration
+
+    def _worker() -> None:
+        while time.perf_counter() < deadline:
+            with lock:
+                q = next(stream)
+            rec.call(target, q, time.perf_counter())
+
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=_worker) for _ in range(concurrency)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return rec.summary(time.perf_counter() - t0, concurrency=concurrency)
+
+
+def open_loop(target, stream: Iterator[str], rate: float, duration: float, max_workers: int, seed: int) -> dict:
+    rec, rng = Recorder(), np.random.default_rng(seed)
+    arrivals = np.cumsum(rng.exponential(1 / rate, size=int(rate * duration * 2) + 1))
+    arrivals = arrivals[arrivals < duration]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for at, q in zip(arrivals, stream):
+            delay = t0 + at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(rec.call, target, q, t0 + at)
+    return rec.summary(time.perf_counter() - t0, rate=rate)
+
+
+def saturation(results: list[dict], open_loop_mode: bool) -> dict | None:
+    for prev, cur in zip([None] + results, results):
+        if open_loop_mode:
+            if cur["throughput_per_s"] < 0.9 * cur["rate"] or cur["error_rate"] > 0.01:
+                return cur
+        elif prev and prev["throughput_per_s"] and prev["p95_ms"]:
+            gain = cur["throughput_per_s"] / prev["throughput_per_s"] - 1
+            slowdown = cur["p95_ms"] / prev["p95_ms"] - 1
+            if (gain < 0.10 and slowdown > 0.50) or cur["error_rate"] > 0.01:
+                return cur
+    return None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--target", default="inproc", help="'inproc' or the base URL of serve.py")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="Closed-loop worker counts")
+    p.add_argument("--rate", type=float, nargs="+", default=None, help="Open-loop arrival rates (queries/s)")
+    p.add_argument("--duration", type=float, default=30.0, help="Seconds per configuration")
+    p.add_argument("--max-workers", type=int, default=64, help="Open-loop client threads")
+    p.add_argument("--limit", type=int, default=None, help="Only replay the first N queries")
+    p.add_argument("--top-n", type=int, default=5)
+    p.add_argument("--timeout", type=float, default=120.0, help="HTTP client timeout (s)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--serial", action="store_true", help="In-process: QAPipeline(parallel=False)")
+    p.add_argument("--micro-batching", action="store_true", help="In-process: QAPipeline(micro_batching=True)")
+    p.add_argument("--stub-llm", action="store_true", help="In-process: deterministic stub instead of OpenAI")
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per stub LLM call")
+    p.add_argument("--local-store", default=None, help="In-process: embedding Excel for LocalVectorStore")
+    p.add_argument("--repeat-queries", action="store_true",
+                   help="Replay identical query texts instead of unique variants (warm-cache numbers)")
+    p.add_argument("--no-rerank-cache", action="store_true",
+                   help="In-process: disable the reranker pair cache (cold rerank on every query)")
+    p.add_argument("--out", default=None, help="Write results as JSON")
+    args = p.parse_args()
+
+    queries = load_queries(args.limit)
+    target = inproc_target(args) if args.target == "inproc" else http_target(args)
+    target(queries[0])  # warm-up (model load, connections)
+    stream = query_stream(queries, unique=not args.repeat_queries)
+
+    results = []
+    header = "rate/s" if args.rate else "workers"
+    print(f"{len(queries)} queries, {args.duration:.0f}s per configuration, target={args.target}\n")
+    print(f"{header:>8}{'sent':>7}{'ok/s':>8}{'err %':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for level in args.rate or args.concurrency:
+        if args.rate:
+            r = open_loop(target, stream, level, args.duration, args.max_workers, args.seed)
+        else:
+            r = closed_loop(target, stream, level, args.duration)
+        results.append(r)
+        print(f"{level:>8g}{r['sent']:>7}{r['throughput_per_s']:>8.2f}{r['error_rate'] * 100:>7.1f}"
+              f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}{r['max_ms']:>9.0f}")
+
+    sat = saturation(results, open_loop_mode=bool(args.rate))
+    if sat is None:
+        print("\nNo saturation within the tested range.")
+    else:
+        key = "rate" if args.rate else "concurrency"
+        print(f"\nSaturation at {key}={sat[key]:g}: {sat['throughput_per_s']:.2f} ok/s, p95 {sat['p95_ms']:.0f} ms")
+    best = max(results, key=lambda r: r["throughput_per_s"])
+    print(f"Peak sustained throughput: {best['throughput_per_s']:.2f} queries/s")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"target": args.target, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
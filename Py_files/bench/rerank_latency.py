@@ -0,0 +1,61 @@
+"""
+rerank_latency.py
+-----------------
+p50 / p95 latency of CrossEncoderReranker.score for 10 / 50 / 200 candidates,
+comparing length-bucketed mini-batches against one fully padded batch.
+
+Candidates are real conversations from the TWCS sample (repeated as needed).
+
+    python Py_files/bench/rerank_latency.py --repeats 20 --batch-size 16
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `llm_pipeline` import
+sys.path.insert(0, str(ROOT))
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from llm_pipeline.reranker import CrossEncoderReranker
+
+SAMPLE = ROOT.parent / "data/processed/sample/twcs_structured_UniqueCount-10_time-20250330-1246.xlsx"
+QUERY = "I accidentally booked the same flight twice. Please refund one."
+
+
+def _latencies(reranker: CrossEncoderReranker, candidates: list[str], repeats: int) -> np.ndarray:
+    reranker.score(QUERY, candidates)  # warm-up
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        reranker.score(QUERY, candidates)
+        times.append(time.perf_counter() - t0)
+    return np.array(times) * 1000
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--repeats", type=int, default=20)
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    args = p.parse_args()
+
+    pool = pd.read_excel(SAMPLE)["cleaned_conversations"].dropna().tolist()
+    reranker = CrossEncoderReranker(batch_size=args.batch_size, cache_size=0)  # repeats must hit the model
+
+    print(f"{'candidates':>10} {'mode':<14} {'p50 ms':>9} {'p95 ms':>9}")
+    for n in args.sizes:
+        candidates = (pool * (n // len(pool) + 1))[:n]
+        for mode, batch_size in (("bucketed", args.batch_size), ("single batch", n)):
+            reranker.batch_size = batch_size
+            ms = _latencies(reranker, candidates, args.repeats)
+            print(f"{n:>10} {mode:<14} {np.percentile(ms, 50):>9.1f} {np.percentile(ms, 95):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
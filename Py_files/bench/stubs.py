@@ -0,0 +1,91 @@
+"""
+stubs.py
+--------
+Deterministic, offline stand-in for the OpenAI chat client, so benchmarks
+can run the full pipeline without network access or API costs.
+
+`StubLLMClient().chat.completions.create(...)` accepts the same arguments as
+the OpenAI client and answers from the request text alone:
+
+- entity prompts (product / services / issue type) get JSON built from the
+  most frequent content words of the conversation
+- the relationship prompt gets RDF triples linking those words
+- anything else (the final answer prompt) gets a short fixed-shape answer
+
+`latency_ms` adds a fixed sleep per call to mimic network round trips.
+"""
+from __future__ import annotations
+
+import json
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+
+from CONFIG import ISSUE_TYPE_PROMPT, PRODUCT_PROMPT, RELATIONSHIP_PROMPT, SERVICES_PROMPT
+
+STOPWORDS = {
+    "customer", "company", "please", "thanks", "thank", "there", "their", "would", "could",
+    "about", "which", "these", "those", "again", "still", "conversation", "message", "content",
+}
+
+
+def _keywords(text: str, n: int = 4) -> list[str]:
+    words = [w for w in re.findall(r"[a-z]{5,}", text.lower()) if w not in STOPWORDS]
+    return [w for w, _ in sorted(Counter(words).items(), key=lambda kv: (-kv[1], kv[0]))[:n]]
+
+
+def _reply(system: str, user: str) -> str:
+    words = _keywords(user) or ["booking"]
+    if system == PRODUCT_PROMPT:
+        return json.dumps({"product": words[:2]})
+    if system == SERVICES_PROMPT:
+        return json.dumps({"service": words[2:3]})
+    if system == ISSUE_TYPE_PROMPT:
+        return json.dumps({"issue_type": [f"{words[-1]} issue"]})
+    if system == RELATIONSHIP_PROMPT:
+        # one triple per line, as in the prompt's OUTPUT FORMAT
+        triples = [{"subject": w, "predicate": "hasIssue", "object": f"{words[-1]} issue"} for w in words[:2]]
+        return "[\n" + ",\n".join("  " + json.dumps(t) for t in triples) + "\n]"
+    return (
+        f"Thanks for reaching out about your {words[0]}. "
+        "Please send us a DM with your confirmation code and we will sort it out."
+    )
+
+
+class _Completions:
+    def __init__(self, latency_ms: float) -> None:
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def create(self, model: str, messages: list[dict], stream: bool = False, **kwargs):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+        text = _reply(system, user)
+        if stream:
+            return (
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=tok))])
+                for tok in re.findall(r"\S+\s*", text)
+            )
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class StubLLMClient:
+    """OpenAI-compatible client returning deterministic answers offline."""
+
+    api_key = "stub"
+
+    def __init__(self, latency_ms: float = 0.0) -> None:
+        self.chat = SimpleNamespace(completions=_Completions(latency_ms))
+
+    @property
+    def calls(self) -> int:
+        return self.chat.completions.calls
@@ -0,0 +1,189 @@
+"""
+eval_runner.py
+--------------
+Incremental, concurrent RAGAS evaluation of `results_cleaned.xlsx`-style
+files (columns `prompts`, `retrievals`, `answers`).
+
+- Every (question, answer, contexts, metric, judge) score is cached in
+  SQLite under a hash of those values, so a rerun only pays the judge LLM
+  for new or changed samples, and switching the judge LLM / embedding model
+  (`--judge-model`, `--embedding-model`) never reuses another judge's scores.
+- Uncached samples are split into shards per metric and the shards run
+  concurrently on `--workers` threads, each with its own `ragas.evaluate`
+  on its own copy of the metric (evaluate binds the judge LLM / embeddings
+  onto the metric object, so shards must not share the module singletons).
+- Metrics are picked by name from `ragas.metrics`.
+
+    python eval_runner.py results_cleaned.xlsx --metrics answer_relevancy faithfulness --workers 4
+    python eval_runner.py results_cleaned.xlsx --out scored.xlsx      # rerun: only new rows are judged
+
+Needs OPENAI_API_KEY (environment or .env) for the judge.
+"""
+import argparse
+import ast
+import copy
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+
+def company_contexts(retrievals):
+    # Company turns of every retrieved conversation, as plain strings
+    contexts = []
+    for item in ast.literal_eval(retrievals) if isinstance(retrievals, str) else retrievals:
+        for msg in item.get("conversation", []):
+            if msg.get("role") == "Company":
+                contexts.append(msg["message"])
+    return contexts
+
+
+def load_samples(path):
+    df = pd.read_excel(path)
+    return pd.DataFrame({
+        "question": df["prompts"].astype(str),
+        "answer": df["answers"].astype(str),
+        "contexts": df["retrievals"].map(company_contexts),
+    })
+
+
+class MetricCache:
+    """SQLite store of per-sample metric scores keyed by content hash."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, metric TEXT, score REAL, at REAL)")
+        self._db.commit()
+
+    @staticmethod
+    def key(question, answer, contexts, metric, judge):
+        payload = json.dumps([question, answer, list(contexts), metric, judge], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), 500):  # stay under SQLite's parameter limit
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(self._db.execute(f"SELECT key, score FROM scores WHERE key IN ({marks})", chunk))
+        return found
+
+    def put_many(self, metric, items):
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)",
+            [(k, metric, v, now) for k, v in items.items()],
+        )
+        self._db.commit()
+
+
+def resolve_metrics(names):
+    import ragas.metrics
+
+    metrics = []
+    for name in names:
+        metric = getattr(ragas.metrics, name, None)
+        if metric is None:
+            raise SystemExit(f"Unknown RAGAS metric: {name}")
+        metrics.append(metric)
+    return metrics
+
+
+def judge_name(judge_model=None, embedding_model=None):
+    # Part of every cache key; None means ragas' own default model
+    return f"llm={judge_model or 'default'};embeddings={embedding_model or 'default'}"
+
+
+def evaluate_shard(metric, rows, judge_model=None, embedding_model=None):
+    # One ragas.evaluate call for a shard of samples and a single metric
+    from datasets import Dataset
+    from ragas import evaluate
+
+    kwargs = {}
+    if judge_model:
+        from ragas.llms import llm_factory
+
+        kwargs["llm"] = llm_factory(model=judge_model)
+    if embedding_model:
+        from ragas.embeddings import embedding_factory
+
+        kwargs["embeddings"] = embedding_factory(model=embedding_model)
+    metric = copy.deepcopy(metric)  # evaluate mutates it; never share across threads
+    result = evaluate(Dataset.from_list(rows), metrics=[metric], **kwargs)
+    return [math.nan if s is None else float(s) for s in result[metric.name]]
+
+
+def run(samples, metrics, cache, workers=4, shard_size=20, judge_model=None, embedding_model=None):
+    """Fills one column per metric in `samples`; returns (evaluated, cached) counts."""
+    jobs, counts = [], {"evaluated": 0, "cached": 0}
+    judge = judge_name(judge_model, embedding_model)
+    for metric in metrics:
+        keys = [
+            cache.key(q, a, c, metric.name, judge)
+            for q, a, c in zip(samples["question"], samples["answer"], samples["contexts"])
+        ]
+        cached = cache.get_many(keys)
+        samples[metric.name] = [cached.get(k, math.nan) for k in keys]
+        todo = [i for i, k in enumerate(keys) if k not in cached]
+        counts["cached"] += len(keys) - len(todo)
+        for start in range(0, len(todo), shard_size):
+            idx = todo[start:start + shard_size]
+            jobs.append((metric, idx, [keys[i] for i in idx]))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(evaluate_shard, metric, samples.loc[idx, ["question", "answer", "contexts"]].to_dict("records"),
+                        judge_model, embedding_model):
+                (metric, idx, keys)
+            for metric, idx, keys in jobs
+        }
+        for done, fut in enumerate(as_completed(futures), start=1):
+            metric, idx, keys = futures[fut]
+            try:
+                scores = fut.result()
+            except Exception as e:
+                print(f"Shard failed ({metric.name}, {len(idx)} samples): {e}")
+                continue
+            samples.loc[idx, metric.name] = scores
+            # NaN scores (judge errors) are left uncached so they are retried
+            cache.put_many(metric.name, {k: s for k, s in zip(keys, scores) if not math.isnan(s)})
+            counts["evaluated"] += len(idx)
+            print(f"[{done}/{len(jobs)}] {metric.name}: {len(idx)} samples")
+    return counts
+
+
+def main():
+    p = argparse.ArgumentParser(description="Cached, concurrent RAGAS evaluation.")
+    p.add_argument("path", help="Excel with prompts / retrievals / answers columns")
+    p.add_argument("--metrics", nargs="+", default=["answer_relevancy"], help="ragas.metrics names")
+    p.add_argument("--workers", type=int, default=4, help="Shards evaluated concurrently")
+    p.add_argument("--shard-size", type=int, default=20, help="Samples per ragas.evaluate call")
+    p.add_argument("--cache", default=None, help="SQLite cache file (default: <path>.ragas_cache.sqlite)")
+    p.add_argument("--out", default=None, help="Write per-sample scores to this Excel file")
+    p.add_argument("--judge-model", default=None, help="Judge LLM for ragas (default: ragas' own)")
+    p.add_argument("--embedding-model", default=None, help="Embedding model for ragas (default: ragas' own)")
+    args = p.parse_args()
+
+    load_dotenv()
+    samples = load_samples(args.path)
+    cache = MetricCache(args.cache or f"{args.path}.ragas_cache.sqlite")
+    metrics = resolve_metrics(args.metrics)
+
+    counts = run(samples, metrics, cache, args.workers, args.shard_size, args.judge_model, args.embedding_model)
+    print(f"\nSamples: {len(samples)}  scores reused: {counts['cached']}  newly judged: {counts['evaluated']}")
+    for metric in metrics:
+        print(f"Overall {metric.name}: {samples[metric.name].mean():.4f}")
+
+    if args.out:
+        samples.to_excel(args.out, index=False)
+        print(f"Saved per-sample scores to {Path(args.out).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+retrieval_metrics.py
+--------------------
+Judge-free retrieval quality: recall@k, MRR, nDCG@k and overlap@k with a
+baseline ranking, for `query_similar` / `LocalVectorStore` hits or reranked
+lists.
+
+Relevance comes either from labels (`qrels`: query -> relevant ChatIDs) or,
+when there are none, from a baseline run: e.g. exact float32 search or the
+current production ranking, whose top-`relevant_depth` ids count as
+relevant. Everything is computed on padded integer matrices, so thousands
+of queries take well under a second.
+
+    python retrieval_metrics.py candidate.json --baseline baseline.json -k 1 5 10
+    python retrieval_metrics.py candidate.json --qrels qrels.json -k 10
+
+Run files are JSON objects `{query: [ChatID, ...]}`, best first: build them
+from search hits with `run_from_hits`, or from reranked output with
+`QAPipeline.run_with_details(q)["chat_ids"]` / `prepare(q)["chat_ids"]`.
+"""
+import argparse
+import json
+
+import numpy as np
+
+
+def hit_ids(hits):
+    # ChatIDs of Elasticsearch / LocalVectorStore hits, in rank order
+    return [str(h["_source"].get("ChatID", h["_id"])) for h in hits]
+
+
+def run_from_hits(queries, hits_per_query):
+    """`{query: [ChatID, ...]}` from one hit list per query."""
+    return {q: hit_ids(hits) for q, hits in zip(queries, hits_per_query)}
+
+
+def _encode(lists, vocab, width):
+    # Ragged id lists -> (n, width) int matrix, -1 padded; repeated ids keep
+    # only their best rank, so a duplicate can't count as a second hit
+    mat = np.full((len(lists), width), -1, dtype=np.int64)
+    for i, ids in enumerate(lists):
+        row = [vocab.setdefault(d, len(vocab)) for d in list(dict.fromkeys(map(str, ids)))[:width]]
+        mat[i, :len(row)] = row
+    return mat
+
+
+def hit_matrix(ranked, relevant, k):
+    """Boolean (n, k): ranked[i][j] is one of relevant[i]; plus relevant counts."""
+    vocab = {}
+    run = _encode(ranked, vocab, k)
+    width = max((len(r) for r in relevant), default=0) or 1
+    rel = _encode(relevant, vocab, width)
+    # padding (-1) equals padding, so mask it out on the run side
+    hits = (run[:, :, None] == rel[:, None, :]).any(axis=2) & (run >= 0)
+    return hits, (rel >= 0).sum(axis=1)
+
+
+def recall_at_k(hits, n_relevant, k):
+    found = hits[:, :k].sum(axis=1)
+    return np.divide(found, n_relevant, out=np.zeros(len(found)), where=n_relevant > 0)
+
+
+def mrr(hits):
+    first = hits.argmax(axis=1)
+    return np.where(hits.any(axis=1), 1.0 / (first + 1), 0.0)
+
+
+def ndcg_at_k(hits, n_relevant, k):
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (hits[:, :k] * discounts).sum(axis=1)
+    ideal = np.cumsum(discounts)[np.clip(np.minimum(n_relevant, k) - 1, 0, None)]
+    return np.where(n_relevant > 0, dcg / ideal, 0.0)
+
+
+def overlap_at_k(ranked, baseline, k):
+    """|top-k ∩ baseline top-k| / k per query."""
+    hits, _ = hit_matrix(ranked, [b[:k] for b in baseline], k)
+    return hits.sum(axis=1) / k
+
+
+def _mean(values):
+    # NaN for an empty run, without numpy's empty-slice warning
+    return float(values.mean()) if len(values) else float("nan")
+
+
+def evaluate(run, qrels=None, baseline=None, ks=(1, 5, 10), relevant_depth=10):
+    """
+    Mean metrics over the queries of `run`.
+
+    run / baseline: {query: [ids best first]}; qrels: {query: [relevant ids]}.
+    Without qrels, the baseline's top-`relevant_depth` ids are the relevant set.
+    An empty run reports NaN for every metric.
+    """
+    queries = list(run)
+    if qrels is None:
+        if baseline is None:
+            raise ValueError("Need qrels or a baseline run")
+        qrels = {q: baseline.get(q, [])[:relevant_depth] for q in queries}
+    ranked = [run[q] for q in queries]
+    relevant = [qrels.get(q, []) for q in queries]
+
+    kmax = max(ks)
+    hits, n_rel = hit_matrix(ranked, relevant, kmax)
+    report = {"queries": len(queries), "MRR": _mean(mrr(hits))}
+    for k in ks:
+        report[f"recall@{k}"] = _mean(recall_at_k(hits, n_rel, k))
+        report[f"nDCG@{k}"] = _mean(ndcg_at_k(hits, n_rel, k))
+        if baseline is not None:
+            base = [baseline.get(q, []) for q in queries]
+            report[f"overlap@{k}"] = _mean(overlap_at_k(ranked, base, k))
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description="Local retrieval metrics (no judge LLM).")
+    p.add_argument("run", help="JSON {query: [ChatID, ...]} to evaluate")
+    p.add_argument("--baseline", default=None, help="Baseline run for overlap (and relevance without --qrels)")
+    p.add_argument("--qrels", default=None, help="JSON {query: [relevant ChatID, ...]}")
+    p.add_argument("-k", type=int, nargs="+", default=[1, 5, 10])
+    p.add_argument("--relevant-depth", type=int, default=10, help="Baseline ids treated as relevant")
+    args = p.parse_args()
+
+    def _load(path):
+        with open(path) as f:
+            return json.load(f)
+
+    report = evaluate(
+        _load(args.run),
+        qrels=_load(args.qrels) if args.qrels else None,
+        baseline=_load(args.baseline) if args.baseline else None,
+        ks=args.k,
+        relevant_depth=args.relevant_depth,
+    )
+    for name, value in report.items():
+        print(f"{name:<12} {value:.4f}" if isinstance(value, float) else f"{name:<12} {value}")
+
+
+if __name__ == "__main__":
+    main()
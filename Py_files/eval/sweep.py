@@ -0,0 +1,253 @@
+"""
+sweep.py
+--------
+Latency / quality sweep over QAPipeline's retrieval depth (`es_top_k`),
+rerank depth (`rerank_top_k`) and hybrid weights, with a Pareto frontier.
+
+Each query is run through the pipeline once, at the largest depths:
+
+- retrieval hits (ChatID, similarity, entity signature) at max `es_top_k`
+- cross-encoder scores for all of them
+- timings: query prep (preprocess + extraction + embedding), search at
+  every `es_top_k` and rerank at every effective depth in the grid
+
+and cached as JSON (`--cache`), so later sweeps only pay for new queries.
+The cache is keyed by the grid, the extraction mode, the LLM and the
+retriever (Elasticsearch index version or local-store file), so it is
+recollected when any of them changes.
+Every grid point is then re-ranked in memory with the pipeline's own
+hybrid scoring and diverse top-n selection; latency is the cached prep +
+search + rerank time for that depth.
+
+Quality is nDCG@n / recall@n (retrieval_metrics) against `--qrels`, or
+without labels against the cross-encoder's own top-n over the full
+candidate pool, plus overlap@n with the current default configuration.
+Note that the label-free reference favours rerank-heavy settings.
+
+    python sweep.py --limit 100 --es-top-k 10 20 50 100 --rerank-top-k 10 20 50
+    python sweep.py --cache sweep_cache.json --out sweep.csv --qrels qrels.json
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from Py_files.QA_Pipeline import QAPipeline
+from Py_files.VectorDBStructure.signature import entity_signature
+from retrieval_metrics import evaluate
+
+TEST_SET = ROOT.parent / "data/processed/test_data/airway_test_data.xlsx"
+DEFAULT = {"es_top_k": 50, "rerank_top_k": 50, "w_sim": 0.7}   # QAPipeline
+CHAT_QA = {"es_top_k": 50, "rerank_top_k": 50, "w_sim": 0.3}   # ChatQAPipeline
+
+
+# ── Collection (once per query) ───────────────────────────────────────────── #
+
+def build_pipeline(args):
+    kwargs = {"parallel": False, "extraction": args.extraction}
+    if args.stub_llm:
+        sys.path.insert(0, str(ROOT / "bench"))
+        from stubs import StubLLMClient
+
+        kwargs["llm_client"] = StubLLMClient()
+    if args.local_store:
+        from Py_files.VectorDBStructure.local_store import LocalVectorStore
+
+        kwargs["retriever"] = LocalVectorStore.from_excel(args.local_store)
+    pipe = QAPipeline(**kwargs)
+    pipe.reranker.cache = None  # timings must reflect real model work
+    return pipe
+
+
+def _ms(fn, *a):
+    t0 = time.perf_counter()
+    out = fn(*a)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def collect(pipe, query, es_ks, depths):
+    """Hits, cross-encoder scores and stage timings for one query."""
+    t0 = time.perf_counter()
+    cleaned, structured = pipe._preprocess_query(query)
+    if pipe.extraction == "llm":
+        entities, relationships = pipe._extract_intents(structured)
+        vecs = pipe.db.text_to_embeddings(cleaned, entities, relationships)
+    elif pipe.extraction == "keywords":
+        vecs = pipe.db.text_to_embeddings(cleaned, pipe._match_intents(cleaned), [])
+    else:
+        vecs = pipe._embed_raw(cleaned)
+    prep_ms = (time.perf_counter() - t0) * 1000
+
+    search_ms = {}
+    for k in sorted(es_ks):
+        pipe.es_top_k = k
+        hits, search_ms[k] = _ms(pipe._search, *vecs)  # largest k last
+
+    candidates = [pipe._compact_candidate(h["_source"]["Conversation_History"]["conversation"]) for h in hits]
+    rerank_ms, scores = {}, []
+    for d in sorted(depths):
+        scores, rerank_ms[d] = _ms(pipe.reranker.score, query, candidates[:d])
+    full = np.full(len(hits), np.nan)
+    full[:len(scores)] = scores
+
+    return {
+        "chat_ids": [str(h["_source"]["ChatID"]) for h in hits],
+        "signatures": [h["_source"].get("Signature") or entity_signature(h["_source"]) for h in hits],
+        "sim": [h["_score"] for h in hits],
+        "rerank": [None if np.isnan(s) else float(s) for s in full],
+        "prep_ms": prep_ms,
+        "search_ms": {str(k): v for k, v in search_ms.items()},
+        "rerank_ms": {str(d): v for d, v in rerank_ms.items()},
+    }
+
+
+def retriever_id(args):
+    # Cached hits are only valid for the same documents
+    if args.local_store:
+        path = Path(args.local_store).resolve()
+        return f"local:{path}@{path.stat().st_mtime_ns}"
+    from Py_files.VectorDBStructure.query import index_version
+
+    return f"elasticsearch:{index_version()}"
+
+
+def load_cache(path, grid_key):
+    if path and Path(path).exists():
+        cache = json.loads(Path(path).read_text())
+        if cache.get("grid") == grid_key:
+            return cache
+        print("Cache was collected for a different grid; recollecting.")
+    return {"grid": grid_key, "queries": {}}
+
+
+# ── In-memory re-scoring ──────────────────────────────────────────────────── #
+
+def rank(shim, rec, es_k, depth, w_sim, top_n):
+    n = min(es_k, len(rec["chat_ids"]))
+    hits = [
+        {"_score": rec["sim"][i], "_source": {"ChatID": rec["chat_ids"][i], "Signature": rec["signatures"][i]}}
+        for i in range(n)
+    ]
+    scores = np.array([np.nan if s is None else s for s in rec["rerank"][:n]], dtype=float)
+    scores[min(depth, n):] = np.nan
+    shim.w_sim, shim.w_rerank = w_sim, 1.0 - w_sim
+    order, _ = shim._hybrid_rank(hits, scores)
+    return [hits[i]["_source"]["ChatID"] for i in shim._select_diverse_topk(hits, order, k=top_n)]
+
+
+def sweep(records, es_ks, rerank_ks, weights, top_n, qrels=None):
+    shim = QAPipeline.__new__(QAPipeline)  # scoring methods only, no models
+    queries = list(records)
+    if qrels is None:
+        # label-free reference: cross-encoder top-n over the full candidate pool
+        qrels = {}
+        for q, rec in records.items():
+            s = np.array([-np.inf if v is None else v for v in rec["rerank"]])
+            qrels[q] = [rec["chat_ids"][i] for i in np.argsort(-s, kind="stable")[:top_n]]
+
+    def _run(es_k, depth, w_sim):
+        return {q: rank(shim, records[q], es_k, depth, w_sim, top_n) for q in queries}
+
+    default_run = _run(DEFAULT["es_top_k"], DEFAULT["rerank_top_k"], DEFAULT["w_sim"])
+    rows = []
+    for es_k, rerank_k, w_sim in itertools.product(es_ks, rerank_ks, weights):
+        depth = min(es_k, rerank_k)
+        latency = np.array([
+            r["prep_ms"] + r["search_ms"][str(es_k)] + r["rerank_ms"][str(depth)] for r in records.values()
+        ])
+        run = _run(es_k, depth, w_sim)
+        quality = evaluate(run, qrels=qrels, ks=(top_n,))
+        overlap = evaluate(run, qrels=default_run, baseline=default_run, ks=(top_n,))
+        rows.append({
+            "es_top_k": es_k,
+            "rerank_top_k": rerank_k,
+            "w_sim": w_sim,
+            "w_rerank": round(1.0 - w_sim, 3),
+            "latency_ms": float(latency.mean()),
+            "latency_p95_ms": float(np.percentile(latency, 95)),
+            f"ndcg@{top_n}": quality[f"nDCG@{top_n}"],
+            f"recall@{top_n}": quality[f"recall@{top_n}"],
+            f"overlap_default@{top_n}": overlap[f"overlap@{top_n}"],
+        })
+    return pd.DataFrame(rows)
+
+
+def pareto(df, quality_col):
+    # Cheapest-first; keep each point that beats every cheaper one on quality
+    front, best = [], -np.inf
+    for i, row in df.sort_values(["latency_ms", quality_col], ascending=[True, False]).iterrows():
+        if row[quality_col] > best:
+            front.append(i)
+            best = row[quality_col]
+    return df.loc[front]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Latency / quality sweep for QAPipeline retrieval settings.")
+    p.add_argument("--limit", type=int, default=50, help="Test-set queries to use")
+    p.add_argument("--es-top-k", type=int, nargs="+", default=[10, 20, 50, 100])
+    p.add_argument("--rerank-top-k", type=int, nargs="+", default=[5, 10, 20, 50])
+    p.add_argument("--w-sim", type=float, nargs="+", default=[round(w, 1) for w in np.linspace(0, 1, 11)],
+                   help="Similarity weights; rerank weight is 1 - w")
+    p.add_argument("--top-n", type=int, default=5)
+    p.add_argument("--extraction", choices=["llm", "keywords", "none"], default="llm")
+    p.add_argument("--stub-llm", action="store_true", help="Deterministic stub instead of OpenAI")
+    p.add_argument("--local-store", default=None, help="Embedding Excel for LocalVectorStore instead of ES")
+    p.add_argument("--qrels", default=None, help="JSON {query: [relevant ChatID, ...]}")
+    p.add_argument("--cache", default="sweep_cache.json", help="Per-query scores and timings")
+    p.add_argument("--out", default=None, help="Write every grid point as CSV")
+    args = p.parse_args()
+
+    depths = sorted({min(k, d) for k in args.es_top_k for d in args.rerank_top_k})
+    grid_key = {
+        "es_top_k": sorted(args.es_top_k),
+        "depths": depths,
+        "extraction": args.extraction,
+        "llm": "stub" if args.stub_llm else "openai",
+        "retriever": retriever_id(args),
+    }
+    cache = load_cache(args.cache, grid_key)
+
+    queries = pd.read_excel(TEST_SET)["Conversation"].dropna().astype(str).tolist()[:args.limit]
+    todo = [q for q in queries if q not in cache["queries"]]
+    if todo:
+        pipe = build_pipeline(args)
+        for i, q in enumerate(todo, start=1):
+            cache["queries"][q] = collect(pipe, q, args.es_top_k, depths)
+            print(f"collected {i}/{len(todo)}")
+        if args.cache:
+            Path(args.cache).write_text(json.dumps(cache))
+    records = {q: cache["queries"][q] for q in queries}
+
+    qrels = json.loads(Path(args.qrels).read_text()) if args.qrels else None
+    t0 = time.perf_counter()
+    df = sweep(records, args.es_top_k, args.rerank_top_k, args.w_sim, args.top_n, qrels)
+    print(f"\n{len(df)} configurations x {len(records)} queries re-scored in {time.perf_counter() - t0:.1f}s")
+
+    quality_col = f"ndcg@{args.top_n}"
+    pd.set_option("display.width", 160)
+    print("\nPareto frontier (latency vs quality):")
+    print(pareto(df, quality_col).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    for name, cfg in (("QAPipeline default", DEFAULT), ("ChatQAPipeline weights", CHAT_QA)):
+        row = df[(df.es_top_k == cfg["es_top_k"]) & (df.rerank_top_k == cfg["rerank_top_k"])
+                 & np.isclose(df.w_sim, cfg["w_sim"])]
+        if len(row):
+            r = row.iloc[0]
+            print(f"{name:<24} latency {r.latency_ms:8.1f} ms  {quality_col} {r[quality_col]:.3f}")
+
+    if args.out:
+        df.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -38,6 +38,9 @@ df3 = pipe.extract_relationships()
 
 # finally save to disk (or skip if you just need the DF in memory)
 pipe.save()
+
+# single conversation at query time (entity prompts fanned out on a pool)
+entities_json, relationship = pipe.extract_one(structured_conv, executor=pool)
 """
 
 from __future__ import annotations
@@ -55,7 +58,8 @@ warnings.filterwarnings("ignore")
 import json
 import logging
 import os
-from typing import Any, Dict
+from concurrent.futures import Executor
+from typing import Any, Dict, Tuple
 
 import numpy as np
 import openai
@@ -93,6 +97,7 @@ class LLMExtractor:
     • `extract_relationships()`  → creates RDF triple text in **relationship** col  
     • `save()`                   → writes Excel; returns final `pd.DataFrame`  
     • `run_pipeline()`           → executes all of the above in order
+    • `extract_one()`            → all steps for ONE conversation, no DataFrame
     """
 
     # -------------------------- init ------------------------------ #
@@ -104,16 +109,19 @@ class LLMExtractor:
         openai_api_key: str | None = None,
         model_entities: str = "gpt-4o-mini",
         random_state: int | None = None,
+        client: Any | None = None,
     ) -> None:
         if dataframe is None and data_path is None:
             raise ValueError("Pass either `data_path` or `dataframe`.")
 
-        # load env & prepare OpenAI client
-        load_dotenv()
-        api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OpenAI API key not found (pass arg or set OPENAI_API_KEY).")
-        self.client = openai.OpenAI(api_key=api_key)
+        # load env & prepare OpenAI client (or use an OpenAI‑compatible one, e.g. a bench stub)
+        if client is None:
+            load_dotenv()
+            api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OpenAI API key not found (pass arg or set OPENAI_API_KEY).")
+            client = openai.OpenAI(api_key=api_key)
+        self.client = client
 
         # dataframe housekeeping
         if dataframe is not None:
@@ -158,13 +166,38 @@ class LLMExtractor:
                 return {}
         return {}
 
+    @staticmethod
+    def _to_str(x: Any) -> str:
+        return x if isinstance(x, str) else json.dumps(x, ensure_ascii=False)
+
+    @classmethod
+    def _pack_entities(cls, product: Any, services: Any, issue_type: Any) -> str:
+        """Merge the three extractor outputs into one **entities** JSON string."""
+        products = cls._safe_json_load(product) or {}
+        services = cls._safe_json_load(services) or {}
+        issues = cls._safe_json_load(issue_type) or {}
+
+        combined = {
+            "products": products.get("product", []) or [],
+            "services": services.get("service", []) or [],
+            "issue_types": issues.get("issue_type", []) or [],
+        }
+        return json.dumps(json.loads(json.dumps(combined, allow_nan=False)))
+
+    @staticmethod
+    def _relationship_input(conversation: Any, entities: str) -> str:
+        return (
+            f"Here is the conversation:\n'{conversation}'.\n"
+            f"Extracted entities:\n{entities}\n"
+            "Identify relationships between these elements and provide RDF triples."
+        )
+
     # ------------------ PUBLIC STEP 1 – entities ------------------- #
     def extract_entities(self) -> pd.DataFrame:
         """Fill **Issue Type**, **Product**, **Services** columns with JSON strings."""
         _LOG.info("STEP 1 – Extracting issue‑types, products, services")
 
-        def _to_str(x):
-            return x if isinstance(x, str) else json.dumps(x, ensure_ascii=False)
+        _to_str = self._to_str
 
         # Use the *new* column name – was `cleaned_conversations` previously
         col_conv = "structured_conversations"
@@ -186,16 +219,9 @@ class LLMExtractor:
         _LOG.info("STEP 2 – Packing entities into single JSON field")
 
         def _pack(row):
-            products = self._safe_json_load(row.get("Product", "")) or {}
-            services = self._safe_json_load(row.get("Services", "")) or {}
-            issues = self._safe_json_load(row.get("Issue Type", "")) or {}
-
-            combined = {
-                "products": products.get("product", []) or [],
-                "services": services.get("service", []) or [],
-                "issue_types": issues.get("issue_type", []) or [],
-            }
-            return json.dumps(json.loads(json.dumps(combined, allow_nan=False)))
+            return self._pack_entities(
+                row.get("Product", ""), row.get("Services", ""), row.get("Issue Type", "")
+            )
 
         self._df["entities"] = self._df.progress_apply(_pack, axis=1)
         return self._df
@@ -208,17 +234,39 @@ class LLMExtractor:
         def _rel(row):
             return self._chat(
                 RELATIONSHIP_PROMPT,
-                (
-                    f"Here is the conversation:\n'{row['structured_conversations']}'.\n"
-                    f"Extracted entities:\n{row['entities']}\n"
-                    "Identify relationships between these elements and provide RDF triples."
-                ),
+                self._relationship_input(row["structured_conversations"], row["entities"]),
                 self.model_entities,
             )
 
         self._df["relationship"] = self._df.progress_apply(_rel, axis=1)
         return self._df
 
+    # -------------- single conversation (query time) -------------- #
+    def extract_one(self, conversation: Any, executor: Executor | None = None) -> Tuple[str, str]:
+        """Steps 1–3 for a single conversation, without touching the DataFrame.
+
+        The three entity prompts are independent, so with an `executor` they
+        run concurrently; the relationship prompt needs their output and runs
+        last. Returns `(entities_json, relationship_text)`.
+        """
+        text = self._to_str(conversation)
+        prompts = (PRODUCT_PROMPT, SERVICES_PROMPT, ISSUE_TYPE_PROMPT)
+        if executor is None:
+            product, services, issue_type = (
+                self._chat(p, text, self.model_entities) for p in prompts
+            )
+        else:
+            futures = [executor.submit(self._chat, p, text, self.model_entities) for p in prompts]
+            product, services, issue_type = (f.result() for f in futures)
+
+        entities = self._pack_entities(product, services, issue_type)
+        relationship = self._chat(
+            RELATIONSHIP_PROMPT,
+            self._relationship_input(conversation, entities),
+            self.model_entities,
+        )
+        return entities, relationship
+
     # ------------------------ save -------------------------------- #
     def save(self) -> pd.DataFrame:
         """Write the *current* DataFrame to an Excel file and return it."""
@@ -1,6 +1,84 @@
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
-from typing import List, Tuple
+import hashlib
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class ScoreCache:
+    """
+    Thread-safe LRU cache of cross-encoder pair scores.
+
+    Keys combine the model name, the normalised query (lower-cased,
+    whitespace-collapsed) and a hash of the candidate text. When `path` is
+    given, scores are also persisted to a SQLite file, which backs the
+    in-memory LRU across restarts.
+    """
+
+    def __init__(self, model_name: str, max_size: int = 10_000, path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL)")
+            self._db.commit()
+
+    def key(self, query: str, candidate: str) -> str:
+        norm_query = re.sub(r"\s+", " ", query).strip().lower()
+        digest = hashlib.sha1()
+        for part in (self.model_name, norm_query, candidate):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        found: Dict[str, float] = {}
+        with self._lock:
+            for k in keys:
+                if k in self._lru:
+                    self._lru.move_to_end(k)
+                    found[k] = self._lru[k]
+            missing = [k for k in keys if k not in found]
+            if self._db is not None and missing:
+                marks = ",".join("?" * len(missing))
+                for k, v in self._db.execute(f"SELECT key, score FROM scores WHERE key IN ({marks})", missing):
+                    found[k] = v
+                    self._put(k, v)
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items: Dict[str, float]) -> None:
+        with self._lock:
+            for k, v in items.items():
+                self._put(k, v)
+            if self._db is not None and items:
+                self._db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?)", items.items())
+                self._db.commit()
+
+    def _put(self, k: str, v: float) -> None:
+        self._lru[k] = v
+        self._lru.move_to_end(k)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def info(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._lru),
+        }
+
 
 class CrossEncoderReranker:
     """
@@ -14,9 +92,14 @@ class CrossEncoderReranker:
         model_name (str): Name of the HuggingFace model to use.
         top_k (int): Number of top-scoring candidates to return.
         device (str): Computation device, automatically set to 'cuda' if available.
+        batch_size (int): Number of pairs per forward pass.
+        max_length (int): Token limit per query-candidate pair.
+        cache (ScoreCache | None): Pair-score cache, None when disabled.
     """
 
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", top_k: int = 5, device: str = None):
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", top_k: int = 5, device: str = None,
+                 batch_size: int = 16, max_length: int = 512,
+                 cache_size: int = 10_000, cache_path: str = None):
         """
         Initializes the CrossEncoderReranker with a specified model and top_k.
 
@@ -24,42 +107,117 @@ class CrossEncoderReranker:
             model_name (str): HuggingFace model identifier.
             top_k (int): Number of top results to return after reranking.
             device (str): Manually specified device ('cuda' or 'cpu'). Auto-detected if None.
+            batch_size (int): Mini-batch size; pairs are grouped by length so each
+                batch is only padded to its own longest pair.
+            max_length (int): Pairs longer than this are truncated.
+            cache_size (int): Max pair scores kept in the LRU cache (0 disables caching).
+            cache_path (str): Optional SQLite file to persist cached scores.
         """
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
+        self.model.eval()
         self.top_k = top_k
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache = ScoreCache(model_name, cache_size, cache_path) if cache_size > 0 else None
 
-    def rerank(self, query: str, candidates: List[str]) -> List[Tuple[str, float]]:
+    def cache_info(self) -> Dict[str, float]:
+        """Hit / miss counts, hit rate and size of the pair-score cache."""
+        if self.cache is None:
+            return {"hits": 0, "misses": 0, "hit_rate": 0.0, "size": 0}
+        return self.cache.info()
+
+    def score(self, query: str, candidates: List[str]) -> List[float]:
         """
-        Scores and reranks the candidate texts based on their relevance to the query.
+        Computes a relevance score for every candidate, in the input order.
+
+        Pairs are tokenized once without padding, sorted by token length and
+        scored in mini-batches with per-batch dynamic padding, so one long
+        conversation no longer pads every pair to `max_length`. Pairs already
+        in the score cache skip the model entirely.
 
         Args:
             query (str): The input query or question.
-            candidates (List[str]): List of retrieved documents/passages to rerank.
+            candidates (List[str]): List of retrieved documents/passages to score.
 
         Returns:
-            List[Tuple[str, float]]: A list of top-k (text, score) pairs, sorted by relevance.
+            List[float]: One score per candidate, aligned with `candidates`.
+        """
+        return self.score_pairs([query] * len(candidates), candidates)
+
+    def score_pairs(self, queries: List[str], candidates: List[str]) -> List[float]:
+        """
+        Like `score`, but every candidate comes with its own query, so the
+        work of several concurrent requests can share the same forward passes.
+
+        Args:
+            queries (List[str]): One query per candidate.
+            candidates (List[str]): Documents/passages to score.
+
+        Returns:
+            List[float]: One score per (query, candidate) pair, in input order.
         """
         if not candidates:
             return []
 
-        # Tokenize the query-candidate pairs as input for the cross-encoder
-        inputs = self.tokenizer(
-            [query] * len(candidates),  # Duplicate query for pairwise scoring
-            candidates,
-            padding=True,
+        scores = [0.0] * len(candidates)
+        todo = list(range(len(candidates)))
+        if self.cache is not None:
+            keys = [self.cache.key(q, c) for q, c in zip(queries, candidates)]
+            cached = self.cache.get_many(keys)
+            for i, k in enumerate(keys):
+                if k in cached:
+                    scores[i] = cached[k]
+            todo = [i for i, k in enumerate(keys) if k not in cached]
+            if not todo:
+                return scores
+
+        # Tokenize the unseen query-candidate pairs once, without padding
+        encoded = self.tokenizer(
+            [queries[i] for i in todo],
+            [candidates[i] for i in todo],
             truncation=True,
-            return_tensors="pt"
-        ).to(self.device)
+            max_length=self.max_length,
+        )
+        features = {
+            i: {key: encoded[key][j] for key in encoded.keys()}
+            for j, i in enumerate(todo)
+        }
+
+        # Shortest first, so neighbours in a batch have similar lengths
+        order = sorted(todo, key=lambda i: len(features[i]["input_ids"]))
+
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_idx = order[start:start + self.batch_size]
+                batch = self.tokenizer.pad(
+                    [features[i] for i in batch_idx],
+                    padding=True,
+                    return_tensors="pt",
+                ).to(self.device)
+                # Compute relevance scores (logits)
+                logits = self.model(**batch).logits.squeeze(-1)
+                for i, s in zip(batch_idx, logits.cpu().reshape(-1).tolist()):
+                    scores[i] = s
 
-        # Disable gradient tracking for inference
-        with torch.no_grad():
-            # Compute relevance scores (logits)
-            scores = self.model(**inputs).logits.squeeze(-1)
+        if self.cache is not None:
+            self.cache.put_many({keys[i]: scores[i] for i in todo})
+        return scores
 
+    def rerank(self, query: str, candidates: List[str]) -> List[Tuple[str, float]]:
+        """
+        Scores and reranks the candidate texts based on their relevance to the query.
+
+        Args:
+            query (str): The input query or question.
+            candidates (List[str]): List of retrieved documents/passages to rerank.
+
+        Returns:
+            List[Tuple[str, float]]: A list of top-k (text, score) pairs, sorted by relevance.
+        """
         # Pair each candidate with its score and sort descending
-        results = list(zip(candidates, scores.cpu().tolist()))
+        results = list(zip(candidates, self.score(query, candidates)))
         results.sort(key=lambda x: x[1], reverse=True)
 
         # Return top-k results
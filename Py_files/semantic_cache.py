@@ -0,0 +1,137 @@
+"""
+Semantic answer cache
+=====================
+Small in‑process vector index of past queries. A new query whose embedding
+is at least ``threshold`` cosine‑similar to a cached one (with the same
+``tag``) gets the cached result back instead of running the pipeline.
+
+▪ Entries expire after ``ttl_seconds``; beyond ``max_size`` the least
+  recently used entry is evicted.
+▪ The cache remembers the index version it was filled against;
+  :meth:`SemanticCache.ensure_version` clears it when that changes (e.g.
+  after an alias swap).
+▪ :meth:`SemanticCache.stats` exposes hit / miss counts and the hit rate.
+
+Usage
+-----
+>>> cache = SemanticCache(threshold=0.93, ttl_seconds=3600, max_size=2000)
+>>> pipeline = QAPipeline(semantic_cache=cache)
+>>> pipeline.run_with_details("refund double booking")["cache_hit"]
+False
+>>> cache.stats()["hit_rate"]
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """Thread‑safe near‑duplicate query cache (brute‑force cosine search)."""
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        ttl_seconds: float | None = 3600,
+        max_size: int = 1000,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+
+        self._vectors: np.ndarray | None = None  # (n, dim), L2‑normalised rows
+        self._entries: List[Dict[str, Any]] = []  # value, tag, created, used
+        self._version: Hashable | None = None
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    # ── Public API ────────────────────────────────────────────────────────── #
+
+    def lookup(self, vector: np.ndarray, tag: Hashable = None) -> Optional[Dict[str, Any]]:
+        """Cached value of the most similar live entry, or *None*.
+
+        The returned dict is the stored value plus ``similarity``.
+        """
+        q = self._normalise(vector)
+        with self._lock:
+            self._expire()
+            if not self._entries:
+                self._counts["misses"] += 1
+                return None
+            sims = self._vectors @ q
+            for i, e in enumerate(self._entries):
+                if e["tag"] != tag:
+                    sims[i] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self._counts["misses"] += 1
+                return None
+            entry = self._entries[best]
+            entry["used"] = time.monotonic()
+            self._counts["hits"] += 1
+            return {**entry["value"], "similarity": float(sims[best])}
+
+    def put(self, vector: np.ndarray, value: Dict[str, Any], tag: Hashable = None) -> None:
+        q = self._normalise(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._expire()
+            while self._entries and len(self._entries) >= self.max_size:
+                lru = min(range(len(self._entries)), key=lambda i: self._entries[i]["used"])
+                self._remove(lru)
+                self._counts["evictions"] += 1
+            row = q[None, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            self._entries.append({"value": value, "tag": tag, "created": now, "used": now})
+
+    def ensure_version(self, version: Hashable) -> None:
+        """Drop every entry if the index *version* differs from the last one seen."""
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._clear()
+                self._counts["invalidations"] += 1
+            self._version = version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+            self._counts["invalidations"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "size": len(self._entries),
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ── Internal helpers ──────────────────────────────────────────────────── #
+
+    @staticmethod
+    def _normalise(vector: np.ndarray) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).ravel()
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def _expire(self) -> None:
+        if self.ttl_seconds is None:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        for i in reversed(range(len(self._entries))):
+            if self._entries[i]["created"] < cutoff:
+                self._remove(i)
+                self._counts["expirations"] += 1
+
+    def _remove(self, i: int) -> None:
+        del self._entries[i]
+        self._vectors = np.delete(self._vectors, i, axis=0) if self._entries else None
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._vectors = None
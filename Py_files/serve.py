@@ -0,0 +1,301 @@
+"""
+QA Service
+==========
+Async HTTP front‑end for :class:`QAPipeline`, so many users can be served
+concurrently from one process.
+
+▪ The pipeline is built **once** at startup, in a worker thread; until it
+  is ready ``/readyz`` answers 503 while ``/healthz`` already answers 200.
+▪ Retrieval and reranking (CPU / GPU bound, blocking) run in a bounded
+  thread pool; the final answer call goes through ``openai.AsyncOpenAI``
+  so waiting on the LLM does not hold a thread. The pipeline's own pools
+  are sized from ``inference_workers`` (:func:`pipeline_factory`), so each
+  inference thread can have its conversation embedding and three
+  extraction prompts in flight at once.
+▪ At most ``max_concurrency`` requests are in flight; a request that cannot
+  get a slot within ``queue_timeout`` seconds gets 503, one that takes
+  longer than ``request_timeout`` seconds gets 504. A timed‑out request
+  keeps its slot until its retrieval thread has finished, so the limit
+  bounds the work actually running, not just the open connections.
+▪ ``/metrics`` returns the per‑stage latency histograms of the pipeline's
+  :class:`Tracer`.
+
+Usage
+-----
+    uvicorn Py_files.serve:app --host 0.0.0.0 --port 8000
+    python Py_files/serve.py --port 8000 --max-concurrency 32
+
+>>> curl -s localhost:8000/query -H 'content-type: application/json' \\
+...      -d '{"query": "I accidentally booked …", "top_n": 5}'
+
+Needs the optional ``fastapi`` and ``uvicorn`` packages.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent  # allow `CONFIG.py` import
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT.parent))
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List
+
+import openai
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from CONFIG import ENDBOT_PROMPT
+from Py_files.QA_Pipeline import QAPipeline
+from Py_files.tracing import stage_totals
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_n: int = Field(5, ge=1, le=20)
+
+
+class QAService:
+    """Owns the pipeline, the inference pool and the concurrency limit.
+
+    ``llm_client`` is the ``openai.AsyncOpenAI``‑compatible client for the
+    answer call. When *None*, one is created from the pipeline's
+    ``openai.OpenAI`` client (same key and base URL); any other pipeline
+    client (e.g. the offline ``StubLLMClient``) answers synchronously on
+    the inference pool instead.
+    """
+
+    def __init__(
+        self,
+        pipeline_factory: Callable[[], QAPipeline] = QAPipeline,
+        max_concurrency: int = 16,
+        inference_workers: int = 4,
+        request_timeout: float = 60.0,
+        queue_timeout: float = 5.0,
+        llm_client: Any = None,
+    ) -> None:
+        self.pipeline_factory = pipeline_factory
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self.queue_timeout = queue_timeout
+
+        self.pipeline: QAPipeline | None = None
+        self.llm = llm_client
+        self._owns_llm = False
+        self.load_error: str | None = None
+        self._pool = ThreadPoolExecutor(max_workers=inference_workers, thread_name_prefix="qa-infer")
+        self._slots: asyncio.Semaphore | None = None
+        self._in_flight = 0
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────── #
+
+    async def start(self) -> None:
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        try:
+            pipeline = await loop.run_in_executor(self._pool, self.pipeline_factory)
+            if self.llm is None and isinstance(pipeline.client, openai.OpenAI):
+                self.llm = openai.AsyncOpenAI(api_key=pipeline.client.api_key, base_url=pipeline.client.base_url)
+                self._owns_llm = True
+        except Exception as exc:  # keep serving /healthz so the failure is visible
+            self.load_error = repr(exc)
+            return
+        self.pipeline = pipeline
+
+    async def stop(self) -> None:
+        if self._owns_llm:
+            await self.llm.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def ready(self) -> bool:
+        return self.pipeline is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "load_error": self.load_error,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    # ── Requests ──────────────────────────────────────────────────────────── #
+
+    async def answer(self, query: str, top_n: int = 5) -> Dict[str, Any]:
+        """Run one query under the concurrency limit and request timeout."""
+        if not self.ready:
+            raise HTTPException(503, "pipeline not ready")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(503, "server saturated, retry later")
+        self._in_flight += 1
+        work: List[Future] = []
+        try:
+            return await asyncio.wait_for(self._answer(query, top_n, work), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(504, f"no answer within {self.request_timeout:.0f}s")
+        finally:
+            if work and not work[-1].done():
+                # A running pool thread cannot be interrupted; it keeps the slot until it finishes
+                loop = asyncio.get_running_loop()
+                work[-1].add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+            else:
+                self._release()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+
+    async def _in_pool(self, work: List[Future], fn: Callable[..., Any], *args: Any) -> Any:
+        # Like run_in_executor, but the request can see whether the thread is still busy
+        future = self._pool.submit(fn, *args)
+        work.append(future)
+        return await asyncio.wrap_future(future)
+
+    async def _answer(self, query: str, top_n: int, work: List[Future]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+
+        cached, cache_key = await self._in_pool(work, self.pipeline.cache_lookup, query, top_n)
+        if cached is not None:
+            cached["total_ms"] = (time.perf_counter() - t0) * 1000
+            return cached
+
+        details = await self._in_pool(work, self.pipeline.prepare, query, top_n, t0)
+        start = time.perf_counter()
+        with self.pipeline.tracer.span("call_llm"):
+            if self.llm is None:
+                details["answer"] = await self._in_pool(work, self.pipeline._call_llm, details["payload"])
+            else:
+                details["answer"] = await self._call_llm(details["payload"])
+        details["timeline"].append(
+            {
+                "stage": "call_llm",
+                "start_ms": (start - t0) * 1000,
+                "end_ms": (time.perf_counter() - t0) * 1000,
+                "thread": "event-loop" if self.llm is not None else "qa-infer",
+            }
+        )
+        details["timings"] = stage_totals(details["timeline"])
+        details["total_ms"] = (time.perf_counter() - t0) * 1000
+        self.pipeline.cache_store(cache_key, details, top_n)
+        return details
+
+    async def _call_llm(self, payload: str) -> str:
+        # Same request as QAPipeline._call_llm, without blocking a thread
+        response = await self.llm.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": ENDBOT_PROMPT},
+                {"role": "user", "content": payload},
+            ],
+            temperature=0,
+            top_p=0.95,
+        )
+        return response.choices[0].message.content
+
+
+def create_app(service: QAService | None = None) -> FastAPI:
+    service = service or QAService()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Load in the background so /healthz is reachable during model load
+        loading = asyncio.create_task(service.start())
+        yield
+        loading.cancel()
+        await service.stop()
+
+    app = FastAPI(title="QA Pipeline", lifespan=lifespan)
+    app.state.service = service
+
+    @app.get("/healthz")
+    async def healthz() -> Dict[str, Any]:
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz() -> Dict[str, Any]:
+        if not service.ready:
+            raise HTTPException(503, service.status())
+        return service.status()
+
+    @app.post("/query")
+    async def query(req: QueryRequest) -> Dict[str, Any]:
+        details = await service.answer(req.query, req.top_n)
+        return {
+            "answer": details["answer"],
+            "payload": details["payload"],
+            "chat_ids": details["chat_ids"],
+            "cache_hit": details.get("cache_hit", False),
+            "total_ms": details["total_ms"],
+            "timings": details.get("timings", {}),
+            "timeline": details.get("timeline", []),
+        }
+
+    @app.get("/metrics")
+    async def metrics() -> Dict[str, Any]:
+        if not service.ready:
+            raise HTTPException(503, service.status())
+        return {"stages": service.pipeline.tracer.histograms(), **service.status()}
+
+    return app
+
+
+def pipeline_factory(inference_workers: int, **kwargs: Any) -> Callable[[], QAPipeline]:
+    """QAPipeline builder whose stage / LLM pools match the inference pool.
+
+    At most ``inference_workers`` requests run :meth:`QAPipeline.prepare`
+    at once, each with one conversation embedding and three entity prompts.
+    """
+    return lambda: QAPipeline(stage_workers=inference_workers, llm_workers=3 * inference_workers, **kwargs)
+
+
+def _env_service() -> QAService:
+    batching = os.getenv("QA_MICRO_BATCHING", "0") == "1"
+    workers = int(os.getenv("QA_INFERENCE_WORKERS", 4))
+    return QAService(
+        pipeline_factory=pipeline_factory(workers, micro_batching=batching),
+        max_concurrency=int(os.getenv("QA_MAX_CONCURRENCY", 16)),
+        inference_workers=workers,
+        request_timeout=float(os.getenv("QA_REQUEST_TIMEOUT", 60)),
+        queue_timeout=float(os.getenv("QA_QUEUE_TIMEOUT", 5)),
+    )
+
+
+app = create_app(_env_service())
+
+
+def main() -> None:
+    import uvicorn
+
+    p = argparse.ArgumentParser(description="Serve QAPipeline over HTTP.")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--max-concurrency", type=int, default=16, help="Requests in flight at once")
+    p.add_argument("--inference-workers", type=int, default=4, help="Threads for retrieval / reranking")
+    p.add_argument("--request-timeout", type=float, default=60.0, help="Seconds before a request gets 504")
+    p.add_argument("--queue-timeout", type=float, default=5.0, help="Seconds to wait for a slot before 503")
+    p.add_argument("--micro-batching", action="store_true",
+                   help="Coalesce concurrent embedding / rerank calls into shared batches")
+    p.add_argument("--batch-wait-ms", type=float, default=2.0)
+    args = p.parse_args()
+
+    service = QAService(
+        pipeline_factory=pipeline_factory(
+            args.inference_workers, micro_batching=args.micro_batching, batch_wait_ms=args.batch_wait_ms),
+        max_concurrency=args.max_concurrency,
+        inference_workers=args.inference_workers,
+        request_timeout=args.request_timeout,
+        queue_timeout=args.queue_timeout,
+    )
+    uvicorn.run(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Tracing
+=======
+Span‑style stage timing for :class:`QAPipeline`.
+
+▪ :meth:`Tracer.span` times one stage. Durations go into per‑stage
+  latency histograms (:meth:`Tracer.histograms`); when the optional
+  ``opentelemetry-api`` package is installed every stage is also an
+  OpenTelemetry span, so any configured exporter (OTLP, Jaeger, console …)
+  picks them up with no further wiring.
+▪ :func:`stage_totals` folds a request timeline into ``{stage: ms}``.
+▪ :func:`profile` wraps a single request in ``cProfile`` or, when
+  installed, ``pyinstrument`` and returns a text report.
+
+Usage
+-----
+>>> tracer = Tracer()
+>>> pipeline = QAPipeline(tracer=tracer)
+>>> pipeline.run_with_details("refund double booking")["timings"]
+>>> tracer.histograms()["rerank"]["p95_ms"]
+>>> print(pipeline.run_with_details("…", profile="cprofile")["profile"])
+"""
+from __future__ import annotations
+
+import bisect
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List
+
+try:  # optional – spans are exported only when OpenTelemetry is installed
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+# Upper bucket bounds in milliseconds (last bucket is open‑ended)
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Tracer:
+    """Thread‑safe per‑stage latency recorder with optional OpenTelemetry spans."""
+
+    def __init__(self, service_name: str = "qa_pipeline", max_samples: int = 10_000) -> None:
+        self.max_samples = max_samples
+        self._otel = otel_trace.get_tracer(service_name) if otel_trace is not None else None
+        self._samples: Dict[str, Deque[float]] = {}
+        self._buckets: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    # ── Public API ────────────────────────────────────────────────────────── #
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        """Time the enclosed block as stage *name*."""
+        start = time.perf_counter()
+        try:
+            if self._otel is None:
+                yield
+            else:
+                with self._otel.start_as_current_span(name, attributes=attributes):
+                    yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def observe(self, name: str, ms: float) -> None:
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.max_samples)
+                self._buckets[name] = [0] * (len(BUCKETS_MS) + 1)
+            self._samples[name].append(ms)
+            self._buckets[name][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def histograms(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: count, mean / p50 / p95 / p99 / max (ms) and bucket counts.
+
+        Percentiles use the last ``max_samples`` observations; ``count`` and
+        ``buckets`` cover everything since the last :meth:`reset`.
+        """
+        with self._lock:
+            out = {}
+            for name, samples in self._samples.items():
+                ordered = sorted(samples)
+                out[name] = {
+                    "count": sum(self._buckets[name]),
+                    "mean_ms": sum(ordered) / len(ordered),
+                    "p50_ms": _percentile(ordered, 50),
+                    "p95_ms": _percentile(ordered, 95),
+                    "p99_ms": _percentile(ordered, 99),
+                    "max_ms": ordered[-1],
+                    "buckets": dict(zip([f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"],
+                                        self._buckets[name])),
+                }
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._buckets.clear()
+
+
+def stage_totals(timeline: List[dict]) -> Dict[str, float]:
+    """``{stage: total_ms}`` for a request timeline (repeated stages are summed)."""
+    totals: Dict[str, float] = {}
+    for entry in timeline:
+        totals[entry["stage"]] = totals.get(entry["stage"], 0.0) + entry["end_ms"] - entry["start_ms"]
+    return totals
+
+
+@contextmanager
+def profile(kind: str = "cprofile", limit: int = 40) -> Iterator[Dict[str, str]]:
+    """Profile the enclosed block; the text report is in ``result["report"]`` afterwards.
+
+    Both profilers only sample the calling thread – pass ``parallel=False``
+    to the pipeline to see the stages that otherwise run in its pools.
+    """
+    result: Dict[str, str] = {}
+    if kind == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield result
+        finally:
+            profiler.stop()
+            result["report"] = profiler.output_text()
+    elif kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            buf = io.StringIO()
+            pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(limit)
+            result["report"] = buf.getvalue()
+    else:
+        raise ValueError(f"profile must be 'cprofile' or 'pyinstrument', got {kind!r}")
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[idx]
@@ -103,26 +103,38 @@ def json_block(obj, title="") -> str:
     title_html = f'<div class="my-json-block-title">{title}</div>' if title else ""
     return f"<div class='my-json-block'>{title_html}<pre>{pretty}</pre></div>"
 
+def answer_card(body: str) -> str:
+    return (
+        f'<div class="custom-card"><b>Answer:</b><br>'
+        f'<div style="font-size:1.1em; margin-top:12px;">{body}</div></div>'
+    )
+
 # ─── Main action ─────────────────────────────────────────────────────────── #
 if st.button("Get Answer", use_container_width=True):
     if not user_query.strip():
         st.warning("Please enter a question first.")
         st.stop()
-    with st.spinner("Generating answer …"):
-        answer, rag_payload = pipeline.run_with_payload(user_query)
-
-    st.markdown(
-        f'<div class="custom-card"><b>Answer:</b><br>'
-        f'<div style="font-size:1.1em; margin-top:12px;">{answer}</div></div>',
-        unsafe_allow_html=True,
-    )
+    answer_box = st.empty()
+    payload_box = st.empty()
+    answer = ""
+    answer_box.markdown(answer_card("<i>Retrieving context …</i>"), unsafe_allow_html=True)
 
-    with st.expander("RAG Payload", expanded=False):
-        try:
-            payload_obj = json.loads(rag_payload) if isinstance(rag_payload, str) else rag_payload
-        except Exception:
-            payload_obj = rag_payload
-        st.markdown(json_block(payload_obj, "Context provided to the model"), unsafe_allow_html=True)
+    # Stream: retrieval results first, then answer tokens as they arrive
+    for event, data in pipeline.stream_with_payload(user_query):
+        if event == "payload":
+            rag_payload = data["payload"]
+            try:
+                payload_obj = json.loads(rag_payload) if isinstance(rag_payload, str) else rag_payload
+            except Exception:
+                payload_obj = rag_payload
+            with payload_box.container():
+                with st.expander("RAG Payload", expanded=False):
+                    st.markdown(json_block(payload_obj, "Context provided to the model"), unsafe_allow_html=True)
+        elif event == "token":
+            answer += data
+            answer_box.markdown(answer_card(answer + " ▌"), unsafe_allow_html=True)
+        elif event == "done":
+            answer_box.markdown(answer_card(data["answer"]), unsafe_allow_html=True)
 else:
     st.markdown(
         '<div class="custom-card" style="background:#171c25;">'
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Same import roots as the scripts: the repo (``Py_files.…``), Py_files
+# (``CONFIG``) and the standalone eval / bench modules
+for path in (ROOT, ROOT / "Py_files", ROOT / "Py_files" / "eval", ROOT / "Py_files" / "bench"):
+    sys.path.insert(0, str(path))
@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from Py_files.batching import BatchedEncoder, BatchedReranker, MicroBatcher
+
+
+def test_results_match_their_callers():
+    batches = []
+
+    def double(items):
+        batches.append(len(items))
+        return [2 * x for x in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(batcher, range(64)))
+    assert results == [2 * x for x in range(64)]
+    assert max(batches) <= 8 and sum(batches) == 64
+    stats = batcher.stats()
+    assert stats["items"] == 64 and stats["batches"] == len(batches)
+    assert stats["mean_batch_size"] > 1  # concurrent calls were coalesced
+
+
+def test_lone_call_is_not_held_back():
+    batcher = MicroBatcher(lambda items: items, max_wait_ms=1)
+    assert batcher("x") == "x"
+    assert batcher.stats()["max_batch_size"] == 1
+
+
+def test_batch_errors_reach_every_caller_and_worker_survives():
+    release = threading.Event()
+
+    def flaky(items):
+        release.wait()
+        if "boom" in items:
+            raise ValueError("boom")
+        return items
+
+    batcher = MicroBatcher(flaky, max_wait_ms=50)
+    futures = [batcher.submit("ok"), batcher.submit("boom")]
+    release.set()
+    for fut in futures:
+        with pytest.raises(ValueError):
+            fut.result(timeout=5)
+    assert batcher("ok") == "ok"
+
+
+class FakeModel:
+    dim = 3
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, normalize_embeddings=False):
+        self.calls.append((list(sentences), normalize_embeddings))
+        return np.array([[len(s), float(normalize_embeddings), 1.0] for s in sentences])
+
+
+def test_batched_encoder_groups_by_kwargs():
+    model = FakeModel()
+    encoder = BatchedEncoder(model, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        a = pool.submit(encoder.encode, "abc", normalize_embeddings=True)
+        b = pool.submit(encoder.encode, ["de", "f"])
+        c = pool.submit(encoder.encode, "ghij", normalize_embeddings=True)
+        a, b, c = a.result(), b.result(), c.result()
+    assert a.tolist() == [3, 1, 1] and c.tolist() == [4, 1, 1]  # single text -> one vector
+    assert b.tolist() == [[2, 0, 1], [1, 0, 1]]
+    # each encode call serves one kwargs group; every text is encoded once
+    assert sorted(t for texts, _ in model.calls for t in texts) == ["abc", "de", "f", "ghij"]
+    assert {n for _, n in model.calls} == {True, False}
+    assert encoder.dim == 3  # other attributes are forwarded
+
+
+class FakeReranker:
+    cache = "cache"
+
+    def __init__(self):
+        self.calls = 0
+
+    def score_pairs(self, queries, candidates):
+        self.calls += 1
+        return [float(len(q) * 10 + len(c)) for q, c in zip(queries, candidates)]
+
+
+def test_batched_reranker_splits_scores_per_request():
+    inner = FakeReranker()
+    reranker = BatchedReranker(inner, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        a = pool.submit(reranker.score, "q", ["a", "bb"])
+        b = pool.submit(reranker.score, "qq", ["ccc"])
+        a, b = a.result(), b.result()
+    assert a == [11.0, 12.0] and b == [23.0]
+    assert reranker.score("q", []) == []
+
+
+def test_batched_reranker_forwards_attribute_writes():
+    inner = FakeReranker()
+    reranker = BatchedReranker(inner)
+    assert reranker.cache == "cache"
+    reranker.cache = None
+    assert inner.cache is None and reranker.cache is None
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from CONFIG import RELATIONSHIP_PROMPT
+from Py_files.VectorDBStructure.db_structure import DatabaseStructure
+from stubs import StubLLMClient
+
+TRIPLES = [
+    {"subject": "flight", "predicate": "hasIssue", "object": "refund issue"},
+    {"subject": "booking", "predicate": "hasIssue", "object": "refund issue"},
+]
+
+
+@pytest.fixture
+def db():
+    return DatabaseStructure.__new__(DatabaseStructure)  # no encoder needed
+
+
+@pytest.mark.parametrize("reply", [
+    json.dumps(TRIPLES),                                   # one line
+    json.dumps(TRIPLES, indent=2),                         # the prompt's multi-line format
+    "Here are the triples:\n```json\n" + json.dumps(TRIPLES) + "\n```",
+])
+def test_fix_relationships_parses_triples(db, reply):
+    assert db.fix_relationships(reply) == TRIPLES
+
+
+@pytest.mark.parametrize("reply", ["no triples here", "[{not json}]", '{"a": 1}', None, float("nan")])
+def test_fix_relationships_unparsable_is_empty(db, reply):
+    assert db.fix_relationships(reply) == []
+
+
+def test_fix_relationships_drops_non_objects(db):
+    assert db.fix_relationships('[{"subject": "a"}, "b", 3]') == [{"subject": "a"}]
+
+
+def test_stub_reply_feeds_structured_to_text(db, monkeypatch):
+    reply = StubLLMClient().chat.completions.create(model="stub", messages=[
+        {"role": "system", "content": RELATIONSHIP_PROMPT},
+        {"role": "user", "content": "flight booking refund, flight refund"},
+    ]).choices[0].message.content
+    monkeypatch.setattr(db, "process_conversation", lambda conversation: "Conversation: …")
+    text = db.structured_to_text("[]", {"products": ["flight"]}, db.fix_relationships(reply))
+    assert text.startswith("products: flight; flight hasIssue booking issue refund hasIssue booking issue.")
@@ -0,0 +1,76 @@
+import math
+import sys
+import time
+import types
+
+import pandas as pd
+import pytest
+
+import eval_runner
+
+
+class RacyMetric:
+    """Stands in for a ragas metric: evaluate binds state onto the object."""
+
+    name = "racy"
+
+    def __init__(self):
+        self.rows = None
+
+
+def _fake_evaluate(dataset, metrics, **judge):
+    # Like ragas.evaluate: configure the metric, then score with it later
+    (metric,) = metrics
+    metric.rows = dataset
+    time.sleep(0.01)  # let other shards configure the same object meanwhile
+    return {metric.name: [len(r["question"]) for r in metric.rows]}
+
+
+@pytest.fixture
+def fake_ragas(monkeypatch):
+    monkeypatch.setitem(sys.modules, "ragas", types.SimpleNamespace(evaluate=_fake_evaluate))
+    monkeypatch.setitem(sys.modules, "datasets", types.SimpleNamespace(
+        Dataset=types.SimpleNamespace(from_list=list)))
+    monkeypatch.setitem(sys.modules, "ragas.llms", types.SimpleNamespace(llm_factory=lambda model: model))
+    monkeypatch.setitem(sys.modules, "ragas.embeddings", types.SimpleNamespace(embedding_factory=lambda model: model))
+
+
+def test_concurrent_shards_score_their_own_rows(fake_ragas):
+    questions = ["q" * n for n in range(1, 41)]
+    samples = pd.DataFrame({"question": questions, "answer": "a", "contexts": [["c"]] * len(questions)})
+    metric = RacyMetric()
+
+    counts = eval_runner.run(samples, [metric], eval_runner.MetricCache(":memory:"), workers=8, shard_size=5)
+
+    assert counts == {"evaluated": 40, "cached": 0}
+    assert samples["racy"].tolist() == [float(len(q)) for q in questions]
+    assert metric.rows is None  # the shared metric object is never mutated
+
+
+def test_cached_scores_are_reused(fake_ragas):
+    samples = pd.DataFrame({"question": ["a", "bb"], "answer": "x", "contexts": [["c"], ["c"]]})
+    cache = eval_runner.MetricCache(":memory:")
+    eval_runner.run(samples, [RacyMetric()], cache, workers=2, shard_size=1)
+
+    again = samples[["question", "answer", "contexts"]].copy()
+    counts = eval_runner.run(again, [RacyMetric()], cache, workers=2, shard_size=1)
+
+    assert counts == {"evaluated": 0, "cached": 2}
+    assert again["racy"].tolist() == [1.0, 2.0]
+
+
+def test_scores_of_another_judge_are_not_reused(fake_ragas):
+    samples = pd.DataFrame({"question": ["a", "bb"], "answer": "x", "contexts": [["c"], ["c"]]})
+    cache = eval_runner.MetricCache(":memory:")
+    eval_runner.run(samples, [RacyMetric()], cache, workers=2, shard_size=1, judge_model="gpt-4o-mini")
+
+    counts = eval_runner.run(samples.copy(), [RacyMetric()], cache, workers=2, shard_size=1, judge_model="gpt-4o")
+    assert counts == {"evaluated": 2, "cached": 0}
+    counts = eval_runner.run(samples.copy(), [RacyMetric()], cache, workers=2, shard_size=1, judge_model="gpt-4o")
+    assert counts == {"evaluated": 0, "cached": 2}
+
+
+def test_evaluate_shard_maps_missing_scores_to_nan(fake_ragas, monkeypatch):
+    monkeypatch.setattr(sys.modules["ragas"], "evaluate", lambda ds, metrics, **judge: {"racy": [None, 0.5]})
+    scores = eval_runner.evaluate_shard(RacyMetric(), [{}, {}])
+    assert math.isnan(scores[0]) and scores[1] == 0.5
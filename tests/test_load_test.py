@@ -0,0 +1,44 @@
+import argparse
+from types import SimpleNamespace
+
+from load_test import closed_loop, inproc_target, open_loop, query_stream, saturation
+from stubs import StubLLMClient
+
+
+class StubPipeline:
+    """Answers through StubLLMClient; records the queries it was sent."""
+
+    def __init__(self):
+        self.client = StubLLMClient(latency_ms=5)
+        self.reranker = SimpleNamespace(cache={})
+        self.queries = []
+
+    def run_with_details(self, query, top_n=5):
+        self.queries.append(query)
+        reply = self.client.chat.completions.create(model="stub", messages=[{"role": "user", "content": query}])
+        return {"answer": reply.choices[0].message.content}
+
+
+def args_for(**overrides):
+    return argparse.Namespace(**{"no_rerank_cache": False, "top_n": 5, **overrides})
+
+
+def test_inproc_keeps_production_caches_by_default():
+    pipeline = StubPipeline()
+    inproc_target(args_for(), pipeline)
+    assert pipeline.reranker.cache == {}
+    inproc_target(args_for(no_rerank_cache=True), pipeline)
+    assert pipeline.reranker.cache is None
+
+
+def test_closed_and_open_loop_smoke():
+    pipeline = StubPipeline()
+    target = inproc_target(args_for(), pipeline)
+    stream = query_stream(["refund please", "lost bag"], unique=True)
+
+    closed = closed_loop(target, stream, concurrency=2, duration=0.2)
+    assert closed["ok"] > 0 and closed["error_rate"] == 0.0 and closed["p50_ms"] >= 5
+    opened = open_loop(target, stream, rate=50, duration=0.2, max_workers=4, seed=0)
+    assert opened["error_rate"] == 0.0 and opened["sent"] == opened["ok"]
+    assert len(set(pipeline.queries)) == len(pipeline.queries)  # unique variants, no cache replay
+    assert saturation([closed], open_loop_mode=False) is None
@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pytest
+
+from Py_files.VectorDBStructure.local_store import LocalVectorStore
+
+
+def make_docs(n=200, dims=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{"ChatID": i, "Embedding": rng.normal(size=dims).tolist(), "Company_name": f"c{i}"} for i in range(n)]
+
+
+def test_float32_matches_exact_cosine():
+    docs = make_docs()
+    store = LocalVectorStore(docs)
+    q = np.asarray(docs[7]["Embedding"])
+    hits = store.query_similar(q, k=3)
+    assert hits[0]["_id"] == "7" and hits[0]["_score"] == pytest.approx(2.0)  # cos + 1
+    assert [h["_score"] for h in hits] == sorted((h["_score"] for h in hits), reverse=True)
+    assert "Embedding" not in hits[0]["_source"] and hits[0]["_source"]["Company_name"] == "c7"
+
+
+@pytest.mark.parametrize("dtype, ratio", [("float16", 0.5), ("int8", 0.25)])
+def test_quantised_stores_are_smaller_and_keep_recall(dtype, ratio):
+    docs = make_docs()
+    exact, approx = LocalVectorStore(docs), LocalVectorStore(docs, dtype=dtype)
+    assert approx.nbytes <= exact.nbytes * ratio + 4 * len(docs)
+    queries = np.random.default_rng(1).normal(size=(50, 32))
+    ref, _ = exact.top_k(queries, k=10)
+    got, _ = approx.top_k(queries, k=10)
+    recall = np.mean([len(set(r) & set(g)) / 10 for r, g in zip(ref, got)])
+    assert recall >= 0.9
+
+
+def test_batch_matches_single_queries():
+    docs = make_docs(50)
+    store = LocalVectorStore(docs, dtype="int8")
+    queries = [d["Embedding"] for d in docs[:4]]
+    batch = store.query_similar_batch(queries, k=5)
+    for hits, q in zip(batch, queries):
+        single = store.query_similar(q, k=5)
+        assert [h["_id"] for h in hits] == [h["_id"] for h in single]
+        assert [h["_score"] for h in hits] == pytest.approx([h["_score"] for h in single], abs=1e-5)
+    assert store.query_similar_batch([], k=5) == []
+
+
+def test_rejects_unknown_dtype():
+    with pytest.raises(ValueError):
+        LocalVectorStore(make_docs(2), dtype="int4")
+
+
+def test_entity_vocabulary_and_keyword_intents():
+    from Py_files.QA_Pipeline import QAPipeline
+
+    docs = make_docs(3, dims=2)
+    docs[0]["Entities"] = {"products": ["Flight", "seat"], "services": ["refund"], "issue_types": []}
+    docs[1]["Entities"] = {"products": ["seat"], "issue_types": "delay"}
+    store = LocalVectorStore(docs)
+    assert store.entity_vocabulary() == {"products": ["Flight", "seat"], "services": ["refund"],
+                                         "issue_types": ["delay"]}
+
+    pipe = QAPipeline.__new__(QAPipeline)  # keywords mode against the injected store, no ES
+    pipe.retriever, pipe._vocab_patterns = store, None
+    assert json.loads(pipe._match_intents("my flight seat refund, long delay")) == {
+        "products": ["flight", "seat"], "services": ["refund"], "issue_types": ["delay"]}
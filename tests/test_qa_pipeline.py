@@ -0,0 +1,356 @@
+import json
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from Py_files.QA_Pipeline import QAPipeline
+from Py_files.tracing import Tracer
+from Py_files.VectorDBStructure.db_structure import DatabaseStructure
+from stubs import StubLLMClient
+
+
+class FakeReranker:
+    """Scores "doc<i>" from a fixed table and records every call size."""
+
+    def __init__(self, table):
+        self.table, self.calls = table, []
+
+    def score(self, query, candidates):
+        self.calls.append(len(candidates))
+        return [self.table[int(c[3:])] for c in candidates]
+
+
+def make_pipeline(**attrs):
+    # Scoring helpers only: no models, no Elasticsearch
+    pipe = QAPipeline.__new__(QAPipeline)
+    defaults = {
+        "rerank_top_k": 50,
+        "cascade_prefix": None,
+        "cascade_margin": 0.05,
+        "candidate_token_budget": None,
+        "w_sim": 0.7,
+        "w_rerank": 0.3,
+        "payload_token_budget": None,
+        "reranker": None,
+    }
+    for name, value in {**defaults, **attrs}.items():
+        setattr(pipe, name, value)
+    return pipe
+
+
+def make_hits(sims, **source):
+    return [
+        {"_score": s, "_source": {"ChatID": str(i), "Conversation_History": {"conversation": f"doc{i}"}, **source}}
+        for i, s in enumerate(sims)
+    ]
+
+
+# ── Cascade reranking ─────────────────────────────────────────────────────── #
+
+def test_without_cascade_scores_rerank_top_k():
+    reranker = FakeReranker(list(range(10)))
+    pipe = make_pipeline(rerank_top_k=6, reranker=reranker)
+    scores = pipe._rerank_scores("q", make_hits([1.0] * 10), top_n=3)
+    assert reranker.calls == [6]
+    assert scores[:6].tolist() == list(range(6)) and np.isnan(scores[6:]).all()
+
+
+def test_cascade_stops_when_retrieval_is_confident():
+    reranker = FakeReranker(list(range(16)))  # would promote the tail if asked
+    pipe = make_pipeline(rerank_top_k=16, cascade_prefix=4, reranker=reranker)
+    sims = [1.9, 1.8, 1.7, 1.6] + [1.2] * 12  # top-n far above the unscored hits
+    scores = pipe._rerank_scores("q", make_hits(sims), top_n=2)
+    assert reranker.calls == [4]
+    assert np.isnan(scores[4:]).all()
+
+
+def test_cascade_stops_when_reranker_keeps_the_head():
+    reranker = FakeReranker([9, 8, 1, 0] + [5] * 12)
+    pipe = make_pipeline(rerank_top_k=16, cascade_prefix=4, reranker=reranker)
+    pipe._rerank_scores("q", make_hits([1.5] * 16), top_n=2)
+    assert reranker.calls == [4]
+
+
+def test_cascade_deepens_while_ambiguous():
+    reranker = FakeReranker(list(range(16)))  # best hits always at the deep end
+    pipe = make_pipeline(rerank_top_k=16, cascade_prefix=2, reranker=reranker)
+    scores = pipe._rerank_scores("q", make_hits([1.5] * 16), top_n=2)
+    assert reranker.calls == [2, 2, 4, 8]  # depth 2 -> 4 -> 8 -> 16
+    assert not np.isnan(scores).any()
+
+
+def test_cascade_never_exceeds_the_hits():
+    reranker = FakeReranker(list(range(5)))
+    pipe = make_pipeline(rerank_top_k=50, cascade_prefix=2, reranker=reranker)
+    scores = pipe._rerank_scores("q", make_hits([1.5] * 5), top_n=2)
+    assert sum(reranker.calls) == 5 and len(scores) == 5
+
+
+# ── Hybrid scoring & signature dedup ──────────────────────────────────────── #
+
+def test_hybrid_rank_mixes_z_scores():
+    pipe = make_pipeline(w_sim=0.5, w_rerank=0.5)
+    hits = make_hits([1.0, 2.0, 3.0])
+    order, hybrid = pipe._hybrid_rank(hits, np.array([30.0, 20.0, 10.0]))
+    # opposite orders with equal weights cancel out; ties keep retrieval order
+    assert hybrid == pytest.approx([0.0, 0.0, 0.0])
+    assert order.tolist() == [0, 1, 2]
+
+    pipe.w_sim, pipe.w_rerank = 0.0, 1.0
+    order, _ = pipe._hybrid_rank(hits, np.array([30.0, 20.0, 10.0]))
+    assert order.tolist() == [0, 1, 2]
+    pipe.w_sim, pipe.w_rerank = 1.0, 0.0
+    order, _ = pipe._hybrid_rank(hits, np.array([30.0, 20.0, 10.0]))
+    assert order.tolist() == [2, 1, 0]
+
+
+def test_hybrid_rank_is_scale_free():
+    pipe = make_pipeline()
+    rerank = np.array([0.2, -1.0, 3.0, 0.5])
+    a, _ = pipe._hybrid_rank(make_hits([1.1, 1.4, 1.2, 1.3]), rerank)
+    b, _ = pipe._hybrid_rank(make_hits([11, 14, 12, 13]), rerank * 100)
+    assert a.tolist() == b.tolist()
+
+
+def test_unscored_hits_rank_with_the_weakest_scored():
+    pipe = make_pipeline(w_sim=0.0, w_rerank=1.0)
+    order, hybrid = pipe._hybrid_rank(make_hits([1.0] * 4), np.array([2.0, 1.0, np.nan, np.nan]))
+    assert hybrid[2] == hybrid[3] == hybrid[1]
+    assert order.tolist() == [0, 1, 2, 3]
+    # nothing scored and constant columns: no NaN, retrieval order kept
+    order, hybrid = pipe._hybrid_rank(make_hits([1.0] * 3), np.full(3, np.nan))
+    assert not np.isnan(hybrid).any() and order.tolist() == [0, 1, 2]
+
+
+def test_diverse_topk_skips_repeated_signatures():
+    hits = make_hits([1.0] * 5)
+    for h, sig in zip(hits, ["a", "a", "b", "a", "c"]):
+        h["_source"]["Signature"] = sig
+    assert QAPipeline._select_diverse_topk(hits, np.arange(5), k=3) == [0, 2, 4]
+    assert QAPipeline._select_diverse_topk(hits, np.array([3, 1, 0, 2]), k=5) == [3, 2]
+
+
+def test_diverse_topk_falls_back_to_entity_signature():
+    hits = make_hits([1.0] * 3)
+    hits[0]["_source"].update(Entities={"products": ["seat"]}, Relationships=[])
+    hits[1]["_source"].update(Entities={"products": ["seat"]}, Relationships=[])
+    hits[2]["_source"].update(Entities={"products": ["bag"]}, Relationships=[])
+    assert QAPipeline._select_diverse_topk(hits, np.arange(3), k=3) == [0, 2]
+
+
+def mmr_case():
+    hits = make_hits([1.0] * 4)
+    vectors = [[1.0, 0.0, 0.0], [0.99, 0.14, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    for h, v in zip(hits, vectors):
+        h["_source"]["Conversation_Embedding"] = v
+    hybrid = np.array([1.0, 0.9, 0.7, 0.1])  # hit 1 is a near-duplicate of hit 0
+    return hits, np.argsort(-hybrid), hybrid
+
+
+def test_mmr_prefers_a_novel_hit_over_a_near_duplicate():
+    hits, order, hybrid = mmr_case()
+    assert make_pipeline(mmr_lambda=0.5)._select_mmr(hits, order, hybrid, k=3) == [0, 2, 3]
+
+
+def test_mmr_with_lambda_one_keeps_the_hybrid_order():
+    hits, order, hybrid = mmr_case()
+    assert make_pipeline(mmr_lambda=1.0)._select_mmr(hits, order, hybrid, k=3) == order[:3].tolist()
+
+
+# ── Candidate compaction ──────────────────────────────────────────────────── #
+
+@pytest.fixture(scope="module")
+def word_tokenizer(tmp_path_factory):
+    # Real WordPiece tokenizer over a local vocab: one token per word
+    from transformers import BertTokenizerFast
+
+    vocab = tmp_path_factory.mktemp("tok") / "vocab.txt"
+    words = [f"{p}{i}" for p in "iabr" for i in range(60)]
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *words]))
+    return BertTokenizerFast(str(vocab))  # positional: vocab_file (v4) or vocab (v5)
+
+
+def turn(role, prefix, n):
+    return f"{role} " + " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def compact(tokenizer, budget, *turns):
+    pipe = make_pipeline(candidate_token_budget=budget, reranker=SimpleNamespace(tokenizer=tokenizer))
+    out = pipe._compact_candidate("\n".join(turns))
+    lines = out.split("\n")
+    assert sum(len(line.split()) - 1 + 2 for line in lines) <= budget  # words + role prefix
+    return lines
+
+
+def test_long_issue_leaves_room_for_the_resolution(word_tokenizer):
+    lines = compact(word_tokenizer, 40,
+                    turn("Customer", "i", 60), turn("Company", "a", 5),
+                    turn("Customer", "b", 5), turn("Company", "r", 10))
+    assert lines == [turn("Customer", "i", 26), turn("Company", "r", 10)]
+
+
+def test_compaction_fills_greedily_in_priority_order(word_tokenizer):
+    lines = compact(word_tokenizer, 30,
+                    turn("Customer", "i", 5), turn("Company", "a", 20),
+                    turn("Customer", "b", 5), turn("Company", "r", 10))
+    # issue, resolution, then the other company turn cut to what is left; original order kept
+    assert lines == [turn("Customer", "i", 5), turn("Company", "a", 9), turn("Company", "r", 10)]
+
+
+def test_compaction_leaves_short_conversations_alone(word_tokenizer):
+    text = "\n".join([turn("Customer", "i", 5), turn("Company", "r", 5)])
+    pipe = make_pipeline(candidate_token_budget=40, reranker=SimpleNamespace(tokenizer=word_tokenizer))
+    assert pipe._compact_candidate(text) == text
+
+
+# ── Payload budget ────────────────────────────────────────────────────────── #
+
+def payload_pipeline(budget):
+    pipe = make_pipeline(payload_token_budget=budget)
+    pipe._encode, pipe._decode = list, "".join  # one token per character
+    return pipe
+
+
+def payload_hits(n, turns=4):
+    hits = []
+    for i in range(n):
+        conversation = "\n".join(
+            f"{'Customer' if t % 2 == 0 else 'Company'} message {t} of conversation {i} " + "x" * 40
+            for t in range(turns)
+        )
+        hits.append({"_source": {
+            "Company_name": f"Airline{i}",
+            "Conversation_History": {"conversation": conversation},
+            "Entities": {"products": ["seat"], "services": [], "issue_types": ["refund"]},
+            "Relationships": [{"subject": "seat", "predicate": "hasIssue", "object": "refund"}],
+        }})
+    return hits
+
+
+def test_payload_within_budget_is_untouched():
+    text, n = payload_pipeline(None)._build_payload(payload_hits(3), "  refund? ")
+    payload = json.loads(text)
+    assert n == len(text) and ", " not in text  # compact separators
+    assert payload["query"] == "refund?"
+    assert [len(r["conversation"]) for r in payload["retrieved_answers"]] == [4, 4, 4]
+    assert payload["retrieved_answers"][0]["relationships"][0]["predicate"] == "hasIssue"
+
+
+def test_payload_trims_lowest_ranked_first():
+    full, n_full = payload_pipeline(None)._build_payload(payload_hits(3), "refund")
+    text, n = payload_pipeline(n_full - 10)._build_payload(payload_hits(3), "refund")
+    answers = json.loads(text)["retrieved_answers"]
+    assert n <= n_full - 10
+    assert [len(a["conversation"]) for a in answers] == [4, 4, 2]  # issue + resolution only
+    assert [t["role"] for t in answers[2]["conversation"]] == ["Customer", "Company"]
+    assert answers[2]["conversation"][1]["message"].startswith("message 3")
+
+
+@pytest.mark.parametrize("budget", [1200, 700, 400, 150])
+def test_payload_respects_budget_and_keeps_best_hit(budget):
+    text, n = payload_pipeline(budget)._build_payload(payload_hits(5), "refund")
+    answers = json.loads(text)["retrieved_answers"]
+    assert n == len(text) <= budget
+    assert answers[0]["company_name"] == "Airline0"
+
+
+# ── Stage overlap ─────────────────────────────────────────────────────────── #
+
+class SlowEncoder:
+    """Deterministic unit vectors per text; every call takes 50 ms."""
+
+    def encode(self, texts, normalize_embeddings=False):
+        time.sleep(0.05)
+        single = isinstance(texts, str)
+        rows = []
+        for text in [texts] if single else texts:
+            v = np.random.default_rng(zlib.crc32(text.encode())).normal(size=8)
+            rows.append(v / np.linalg.norm(v))
+        return rows[0] if single else np.array(rows)
+
+
+class SlowExtractor:
+    def extract_one(self, structured_conv, executor=None):
+        time.sleep(0.2)
+        entities = {"products": ["seat"], "services": [], "issue_types": ["refund"]}
+        return json.dumps(entities), '[{"subject": "seat", "predicate": "hasIssue", "object": "refund"}]'
+
+
+class VectorRetriever:
+    def __init__(self, n=12):
+        self.hits = payload_hits(n)
+        rng = np.random.default_rng(0)
+        for i, h in enumerate(self.hits):
+            h["_source"].update(ChatID=str(i), Signature=str(i), vec=rng.normal(size=8))
+
+    def query_similar(self, embedding, k):
+        scored = [{**h, "_score": float(np.dot(embedding, h["_source"]["vec"]))} for h in self.hits]
+        return sorted(scored, key=lambda h: -h["_score"])[:k]
+
+
+class LengthReranker:
+    def score(self, query, candidates):
+        return [float(len(c) % 7) for c in candidates]
+
+
+def overlap_pipeline(parallel):
+    db = DatabaseStructure.__new__(DatabaseStructure)
+    db.model = SlowEncoder()
+    pipe = payload_pipeline(None)
+    pipe.__dict__.update(
+        db=db, extractor=SlowExtractor(), retriever=VectorRetriever(), reranker=LengthReranker(),
+        tracer=Tracer(), parallel=parallel, extraction="llm", diversity="signature",
+        es_top_k=10, rerank_top_k=6, vector_weights=None, knn_candidates=None,
+        _stage_pool=ThreadPoolExecutor(2) if parallel else None,
+        _llm_pool=ThreadPoolExecutor(3) if parallel else None,
+    )
+    return pipe
+
+
+def test_conversation_embedding_overlaps_extraction():
+    details = overlap_pipeline(parallel=True).prepare("my seat refund never arrived", top_n=3)
+    stages = {e["stage"]: e for e in details["timeline"]}
+    conv, extract = stages["embed_conversation"], stages["extract_intents"]
+    assert conv["thread"] != extract["thread"]
+    assert conv["start_ms"] < extract["end_ms"] and extract["start_ms"] < conv["end_ms"]
+    assert conv["end_ms"] <= stages["embed"]["end_ms"]
+
+
+def test_parallel_prepare_matches_serial():
+    query = "my seat refund never arrived"
+    parallel = overlap_pipeline(parallel=True).prepare(query, top_n=3)
+    serial = overlap_pipeline(parallel=False).prepare(query, top_n=3)
+    assert "embed_conversation" not in {e["stage"] for e in serial["timeline"]}
+    assert parallel["chat_ids"] == serial["chat_ids"]
+    assert parallel["payload"] == serial["payload"]
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────── #
+
+def stream_pipeline(client):
+    pipe = overlap_pipeline(parallel=False)
+    pipe.__dict__.update(client=client, semantic_cache=None)
+    return pipe
+
+
+def test_stream_yields_tokens_and_traces_the_request():
+    pipe = stream_pipeline(StubLLMClient())
+    events = list(pipe.stream_with_payload("my seat refund never arrived", top_n=3))
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "payload" and kinds[-1] == "done" and kinds.count("token") > 1
+    done = events[-1][1]
+    assert done["answer"] == "".join(data for kind, data in events if kind == "token")
+    assert done["ttft_ms"] <= done["total_ms"]
+    assert pipe.tracer.histograms()["request"]["count"] == 1
+
+
+def test_stream_without_chunks_still_reports_ttft():
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: iter([]))))
+    events = list(stream_pipeline(client).stream_with_payload("my seat refund never arrived", top_n=3))
+    done = events[-1][1]
+    assert [kind for kind, _ in events] == ["payload", "done"]
+    assert done["answer"] == "" and done["ttft_ms"] == done["total_ms"]
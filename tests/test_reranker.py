@@ -0,0 +1,130 @@
+import pytest
+import torch
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+from Py_files.llm_pipeline.reranker import CrossEncoderReranker, ScoreCache
+
+WORDS = "refund flight booking seat delay bag lost cancel twice hotel car please help".split()
+
+
+@pytest.fixture(scope="module")
+def tiny_parts(tmp_path_factory):
+    # Random tiny cross-encoder built locally, so no model download is needed
+    vocab = tmp_path_factory.mktemp("tok") / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *WORDS]))
+    tokenizer = BertTokenizerFast(str(vocab))  # positional: vocab_file (v4) or vocab (v5)
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(WORDS) + 5, hidden_size=16, num_hidden_layers=1,
+                        num_attention_heads=2, intermediate_size=32, num_labels=1)
+    model = BertForSequenceClassification(config).eval()
+    return tokenizer, model
+
+
+def make_reranker(tiny_parts, batch_size=16):
+    reranker = CrossEncoderReranker.__new__(CrossEncoderReranker)
+    reranker.tokenizer, reranker.model = tiny_parts
+    reranker.device, reranker.top_k, reranker.max_length = "cpu", 5, 64
+    reranker.batch_size = batch_size
+    reranker.cache = None
+    return reranker
+
+
+CANDIDATES = [
+    "refund",
+    "flight delay bag lost please help refund booking twice seat hotel car cancel",
+    "seat",
+    "hotel car cancel",
+    "booking twice please refund flight",
+]
+
+
+def test_bucketed_batches_match_one_pair_at_a_time(tiny_parts):
+    single = make_reranker(tiny_parts, batch_size=1).score("refund flight", CANDIDATES)
+    bucketed = make_reranker(tiny_parts, batch_size=2).score("refund flight", CANDIDATES)
+    assert bucketed == pytest.approx(single, abs=1e-5)
+
+
+def test_scores_keep_input_order(tiny_parts):
+    reranker = make_reranker(tiny_parts, batch_size=2)
+    forward = reranker.score("refund flight", CANDIDATES)
+    backward = reranker.score("refund flight", CANDIDATES[::-1])
+    assert backward == pytest.approx(forward[::-1], abs=1e-5)
+
+
+def test_score_pairs_matches_per_query_score(tiny_parts):
+    reranker = make_reranker(tiny_parts)
+    pairs = reranker.score_pairs(["refund"] * 2 + ["seat delay"] * 2, CANDIDATES[:2] * 2)
+    assert pairs[:2] == pytest.approx(reranker.score("refund", CANDIDATES[:2]), abs=1e-5)
+    assert pairs[2:] == pytest.approx(reranker.score("seat delay", CANDIDATES[:2]), abs=1e-5)
+
+
+def test_rerank_sorts_by_score(tiny_parts):
+    reranker = make_reranker(tiny_parts)
+    ranked = reranker.rerank("refund flight", CANDIDATES)
+    scores = [s for _, s in ranked]
+    assert scores == sorted(scores, reverse=True)
+    assert len(ranked) == min(reranker.top_k, len(CANDIDATES))
+
+
+def test_empty_candidates(tiny_parts):
+    assert make_reranker(tiny_parts).score("refund", []) == []
+
+
+# ── Pair-score cache ──────────────────────────────────────────────────────── #
+
+class CountingModel(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model, self.pairs = model, 0
+
+    def forward(self, **batch):
+        self.pairs += batch["input_ids"].shape[0]
+        return self.model(**batch)
+
+
+def test_cache_key_normalises_query_only():
+    cache = ScoreCache("m")
+    assert cache.key("  Refund   my Flight ", "a") == cache.key("refund my flight", "a")
+    assert cache.key("refund", "a") != cache.key("refund", "A")
+    assert ScoreCache("other").key("refund", "a") != cache.key("refund", "a")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ScoreCache("m", max_size=2)
+    cache.put_many({"a": 1.0, "b": 2.0})
+    cache.get_many(["a"])  # "b" is now the oldest
+    cache.put_many({"c": 3.0})
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1.0, "c": 3.0}
+    assert cache.info()["size"] == 2
+
+
+def test_cache_persists_to_sqlite(tmp_path):
+    path = str(tmp_path / "scores.sqlite")
+    ScoreCache("m", path=path).put_many({"a": 0.5})
+    reopened = ScoreCache("m", path=path)
+    assert reopened.get_many(["a", "b"]) == {"a": 0.5}
+    assert reopened.info()["hits"] == 1 and reopened.info()["misses"] == 1
+
+
+def test_reranker_scores_only_unseen_pairs(tiny_parts):
+    reranker = make_reranker(tiny_parts)
+    reranker.model = CountingModel(reranker.model)
+    reranker.cache = ScoreCache("tiny")
+
+    first = reranker.score("refund flight", CANDIDATES[:3])
+    assert reranker.model.pairs == 3
+    again = reranker.score("Refund  flight", CANDIDATES)
+    assert reranker.model.pairs == 5  # only the two new candidates hit the model
+    assert again[:3] == pytest.approx(first)
+    assert reranker.cache_info()["hits"] == 3
+
+
+def test_cache_size_zero_disables_cache(monkeypatch, tiny_parts):
+    import Py_files.llm_pipeline.reranker as module
+
+    tokenizer, model = tiny_parts
+    monkeypatch.setattr(module.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    monkeypatch.setattr(module.AutoModelForSequenceClassification, "from_pretrained", lambda name: model)
+    reranker = CrossEncoderReranker(device="cpu", cache_size=0)
+    assert reranker.cache is None
+    assert reranker.cache_info() == {"hits": 0, "misses": 0, "hit_rate": 0.0, "size": 0}
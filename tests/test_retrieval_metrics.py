@@ -0,0 +1,68 @@
+import math
+import warnings
+
+import numpy as np
+import pytest
+
+from retrieval_metrics import evaluate, hit_ids, hit_matrix, ndcg_at_k, recall_at_k
+
+
+def test_perfect_run_scores_one():
+    report = evaluate({"q": ["1", "2", "3"]}, qrels={"q": ["1", "2"]}, ks=(1, 2))
+    assert report["MRR"] == 1.0
+    assert report["recall@2"] == 1.0
+    assert report["nDCG@2"] == pytest.approx(1.0)
+
+
+def test_duplicate_run_ids_count_once():
+    report = evaluate({"q": ["1", "1"]}, qrels={"q": ["1"]}, ks=(2,))
+    assert report["recall@2"] == 1.0
+    assert report["nDCG@2"] == pytest.approx(1.0)
+
+    report = evaluate({"q": ["1", "1", "2"]}, qrels={"q": ["1", "2"]}, ks=(2,))
+    assert report["recall@2"] == 1.0  # "1" then "2" after dedup
+    assert report["nDCG@2"] == pytest.approx(1.0)
+
+    report = evaluate({"q": ["1", "1"]}, qrels={"q": ["1", "2"]}, ks=(2,))
+    assert report["recall@2"] == 0.5
+    assert report["nDCG@2"] <= 1.0
+
+
+def test_ids_are_compared_as_strings():
+    hits, n_rel = hit_matrix([[1, 2]], [["2"]], k=2)
+    assert hits.tolist() == [[False, True]]
+    assert n_rel.tolist() == [1]
+
+
+def test_empty_run_is_nan_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        report = evaluate({}, qrels={}, ks=(5,))
+    assert report["queries"] == 0
+    assert math.isnan(report["MRR"]) and math.isnan(report["recall@5"]) and math.isnan(report["nDCG@5"])
+
+
+def test_queries_without_relevant_ids_score_zero():
+    hits, n_rel = hit_matrix([["1"]], [[]], k=1)
+    assert recall_at_k(hits, n_rel, 1).tolist() == [0.0]
+    assert ndcg_at_k(hits, n_rel, 1).tolist() == [0.0]
+
+
+def test_baseline_gives_relevance_and_overlap():
+    baseline = {"q": ["a", "b", "c", "d"]}
+    report = evaluate({"q": ["b", "x", "a"]}, baseline=baseline, ks=(2,), relevant_depth=2)
+    assert report["MRR"] == 1.0
+    assert report["recall@2"] == 0.5
+    assert report["overlap@2"] == 0.5
+
+
+def test_hit_ids_prefer_chat_id():
+    hits = [{"_id": "x1", "_source": {"ChatID": 7}}, {"_id": "x2", "_source": {}}]
+    assert hit_ids(hits) == ["7", "x2"]
+
+
+def test_ndcg_discounts_lower_ranks():
+    early = evaluate({"q": ["1", "x"]}, qrels={"q": ["1"]}, ks=(2,))["nDCG@2"]
+    late = evaluate({"q": ["x", "1"]}, qrels={"q": ["1"]}, ks=(2,))["nDCG@2"]
+    assert early == pytest.approx(1.0)
+    assert late == pytest.approx(1 / np.log2(3))
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from Py_files.semantic_cache import SemanticCache
+
+
+def vec(*xs):
+    return np.array(xs, dtype=np.float32)
+
+
+def test_hit_above_threshold_only():
+    cache = SemanticCache(threshold=0.9)
+    cache.put(vec(1, 0), {"answer": "a"})
+    hit = cache.lookup(vec(10, 1))  # cos ≈ 0.995, scale does not matter
+    assert hit["answer"] == "a" and hit["similarity"] == pytest.approx(0.995, abs=1e-3)
+    assert cache.lookup(vec(1, 1)) is None  # cos ≈ 0.707
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_tags_are_kept_apart():
+    cache = SemanticCache()
+    cache.put(vec(1, 0), {"answer": "top5"}, tag=5)
+    assert cache.lookup(vec(1, 0), tag=3) is None
+    assert cache.lookup(vec(1, 0), tag=5)["answer"] == "top5"
+
+
+def test_lookup_does_not_expose_stored_value():
+    cache = SemanticCache()
+    cache.put(vec(1, 0), {"answer": "a"})
+    cache.lookup(vec(1, 0))["answer"] = "changed"
+    assert cache.lookup(vec(1, 0))["answer"] == "a"
+
+
+def test_least_recently_used_is_evicted(monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("Py_files.semantic_cache.time.monotonic", lambda: next(clock))
+    cache = SemanticCache(max_size=2, ttl_seconds=None)
+    cache.put(vec(1, 0), {"answer": "a"})
+    cache.put(vec(0, 1), {"answer": "b"})
+    cache.lookup(vec(1, 0))  # "b" becomes least recently used
+    cache.put(vec(-1, 0), {"answer": "c"})
+    assert cache.lookup(vec(0, 1)) is None
+    assert cache.lookup(vec(1, 0))["answer"] == "a"
+    assert cache.stats()["evictions"] == 1 and len(cache) == 2
+
+
+def test_entries_expire(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("Py_files.semantic_cache.time.monotonic", lambda: now[0])
+    cache = SemanticCache(ttl_seconds=10)
+    cache.put(vec(1, 0), {"answer": "a"})
+    now[0] = 5.0
+    assert cache.lookup(vec(1, 0)) is not None
+    now[0] = 11.0
+    assert cache.lookup(vec(1, 0)) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_version_change_clears_the_cache():
+    cache = SemanticCache()
+    cache.ensure_version("v1")
+    cache.put(vec(1, 0), {"answer": "a"})
+    cache.ensure_version("v1")
+    assert len(cache) == 1
+    cache.ensure_version("v2")
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
@@ -0,0 +1,102 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+from Py_files.serve import QAService, create_app
+from Py_files.tracing import Tracer
+from stubs import StubLLMClient
+
+
+class StubPipeline:
+    """prepare() sleeps `delay` seconds (or blocks on `gate`) and counts overlap."""
+
+    def __init__(self, delay=0.0, gate=None):
+        self.client, self.tracer = StubLLMClient(), Tracer()
+        self.delay, self.gate = delay, gate
+        self.running = self.peak = 0
+        self._lock = threading.Lock()
+
+    def cache_lookup(self, query, top_n):
+        return None, None
+
+    def cache_store(self, key, details, top_n):
+        pass
+
+    def prepare(self, query, top_n, t0):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.running -= 1
+        return {"payload": f'{{"query": "{query}"}}', "chat_ids": ["1"], "timeline": []}
+
+    def _call_llm(self, payload):
+        return "answer to " + payload
+
+
+def client_for(pipeline, factory=None, **kwargs):
+    service = QAService(pipeline_factory=factory or (lambda: pipeline), **kwargs)
+    return service, TestClient(create_app(service))
+
+
+def wait_ready(client):
+    for _ in range(100):
+        if client.get("/readyz").status_code == 200:
+            return
+        time.sleep(0.02)
+    raise AssertionError("service never became ready")
+
+
+def test_readyz_waits_for_the_pipeline():
+    loaded = threading.Event()
+    pipeline = StubPipeline()
+
+    def factory():
+        loaded.wait(5)
+        return pipeline
+
+    _, client = client_for(pipeline, factory=factory)
+    with client:
+        assert client.get("/healthz").status_code == 200
+        assert client.get("/readyz").status_code == 503
+        assert client.post("/query", json={"query": "refund"}).status_code == 503
+        loaded.set()
+        wait_ready(client)
+        body = client.post("/query", json={"query": "refund"}).json()
+        assert body["answer"].startswith("answer to") and body["chat_ids"] == ["1"]
+
+
+def test_timeout_keeps_the_slot_until_the_thread_finishes():
+    pipeline = StubPipeline(delay=0.5)
+    service, client = client_for(pipeline, max_concurrency=1, request_timeout=0.1, queue_timeout=0.05)
+    with client:
+        wait_ready(client)
+        assert client.post("/query", json={"query": "slow"}).status_code == 504
+        # prepare() is still running in the pool, so the only slot is taken
+        assert service.status()["in_flight"] == 1
+        assert client.post("/query", json={"query": "next"}).status_code == 503
+        time.sleep(0.6)
+        assert service.status()["in_flight"] == 0
+        assert client.post("/query", json={"query": "next"}).status_code == 504  # slot is free again
+        time.sleep(0.6)
+
+
+def test_concurrency_limit_bounds_running_requests():
+    pipeline = StubPipeline(delay=0.1)
+    _, client = client_for(pipeline, max_concurrency=2, inference_workers=8, queue_timeout=10)
+    with client:
+        wait_ready(client)
+        with ThreadPoolExecutor(6) as pool:
+            codes = list(pool.map(lambda i: client.post("/query", json={"query": f"q{i}"}).status_code, range(6)))
+    assert codes == [200] * 6
+    assert pipeline.peak == 2
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from Py_files.VectorDBStructure import store_embeddings
+
+
+def docs(n):
+    return [{"ChatID": str(i), "Embedding": [0.0, 1.0]} for i in range(n)]
+
+
+@pytest.fixture
+def bulk(monkeypatch):
+    """Mocked bulk helpers: document ids in `fail` come back as failures."""
+    calls = {"fail": set(), "helper": None, "actions": []}
+
+    def _results(helper):
+        def _bulk(es, actions, **kwargs):
+            calls["helper"] = helper
+            for action in actions:
+                calls["actions"].append(action)
+                ok = action["_id"] not in calls["fail"]
+                yield ok, {"index": {"_id": action["_id"], "status": 201 if ok else 400}}
+        return _bulk
+
+    monkeypatch.setattr(store_embeddings.helpers, "parallel_bulk", _results("parallel_bulk"))
+    monkeypatch.setattr(store_embeddings.helpers, "streaming_bulk", _results("streaming_bulk"))
+    return calls
+
+
+@pytest.mark.parametrize("threads, helper", [(4, "parallel_bulk"), (1, "streaming_bulk")])
+def test_stream_index_counts_failures(bulk, threads, helper):
+    bulk["fail"] = {"p-3", "p-7"}
+    stats = store_embeddings.stream_index(None, docs(10), "idx", chunk_size=4, thread_count=threads, id_prefix="p-")
+    assert stats == {"indexed": 8, "failed": 2}
+    assert bulk["helper"] == helper
+    assert [a["_id"] for a in bulk["actions"]] == [f"p-{i}" for i in range(10)]
+    assert {a["_index"] for a in bulk["actions"]} == {"idx"}
+
+
+class FakeIndices:
+    """Records index / alias calls; `old` is what the alias points to."""
+
+    def __init__(self, old):
+        self.old, self.calls = old, []
+
+    def exists_alias(self, name):
+        return bool(self.old)
+
+    def get_alias(self, name):
+        return {i: {} for i in self.old}
+
+    def exists(self, index):
+        return index in self.old
+
+    def __getattr__(self, name):
+        return lambda **kwargs: self.calls.append((name, kwargs.get("index")))
+
+
+def test_rebuild_swaps_alias_and_drops_old_index(bulk):
+    es = SimpleNamespace(indices=FakeIndices(old=["chat_v1"]))
+    new = store_embeddings.build_versioned_index(es, docs(10), "chat", dims=2, thread_count=1)
+    names = [n for n, _ in es.indices.calls]
+    assert names.index("update_aliases") < names.index("delete")
+    assert es.indices.calls[-1] == ("delete", "chat_v1") and new.startswith("chat_v")
+
+
+def test_rebuild_with_failures_keeps_alias_and_old_index(bulk):
+    bulk["fail"] = {"5"}
+    es = SimpleNamespace(indices=FakeIndices(old=["chat_v1"]))
+    with pytest.raises(RuntimeError, match="1 documents failed"):
+        store_embeddings.build_versioned_index(es, docs(10), "chat", dims=2, thread_count=1)
+    names = [n for n, _ in es.indices.calls]
+    assert "update_aliases" not in names and "put_settings" not in names
+    created = next(i for n, i in es.indices.calls if n == "create")
+    assert es.indices.calls[-1] == ("delete", created)  # only the half-built index is dropped
@@ -0,0 +1,57 @@
+import json
+
+import pandas as pd
+import pytest
+
+import sweep
+
+
+def record(n=6, sigs=None):
+    return {
+        "chat_ids": [str(i) for i in range(n)],
+        "signatures": sigs or [f"s{i}" for i in range(n)],
+        "sim": [2.0 - 0.1 * i for i in range(n)],
+        "rerank": [float(i) for i in range(n)],  # cross-encoder prefers the tail
+        "prep_ms": 10.0,
+        "search_ms": {"3": 1.0, "6": 2.0},
+        "rerank_ms": {"3": 30.0, "6": 60.0},
+    }
+
+
+def test_pareto_keeps_points_that_beat_every_cheaper_one():
+    df = pd.DataFrame({"latency_ms": [1, 2, 3, 4], "q": [0.5, 0.4, 0.7, 0.7]})
+    assert sweep.pareto(df, "q")["latency_ms"].tolist() == [1, 3]
+
+
+def test_rank_uses_only_the_configured_depths():
+    shim = sweep.QAPipeline.__new__(sweep.QAPipeline)
+    rec = record()
+    # rerank weight only: order follows cross-encoder scores within the depth
+    assert sweep.rank(shim, rec, es_k=6, depth=6, w_sim=0.0, top_n=3) == ["5", "4", "3"]
+    assert sweep.rank(shim, rec, es_k=3, depth=3, w_sim=0.0, top_n=3) == ["2", "1", "0"]
+    assert sweep.rank(shim, rec, es_k=6, depth=6, w_sim=1.0, top_n=3) == ["0", "1", "2"]
+
+
+def test_rank_dedups_by_signature():
+    shim = sweep.QAPipeline.__new__(sweep.QAPipeline)
+    rec = record(sigs=["a", "a", "b", "b", "c", "c"])
+    assert sweep.rank(shim, rec, es_k=6, depth=6, w_sim=1.0, top_n=3) == ["0", "2", "4"]
+
+
+def test_sweep_grid_and_label_free_reference():
+    records = {"q1": record(), "q2": record()}
+    df = sweep.sweep(records, es_ks=[3, 6], rerank_ks=[3, 6], weights=[0.0, 1.0], top_n=2)
+    assert len(df) == 8
+    best = df[(df.es_top_k == 6) & (df.rerank_top_k == 6) & (df.w_sim == 0.0)].iloc[0]
+    assert best["ndcg@2"] == pytest.approx(1.0)  # matches the cross-encoder's own top-2
+    assert best["latency_ms"] == pytest.approx(10 + 2 + 60)
+    shallow = df[(df.es_top_k == 6) & (df.rerank_top_k == 3)].iloc[0]
+    assert shallow["latency_ms"] == pytest.approx(10 + 2 + 30)
+
+
+def test_cache_is_reused_only_for_the_same_grid(tmp_path):
+    path = tmp_path / "cache.json"
+    key = {"es_top_k": [3], "depths": [3], "extraction": "none", "llm": "stub", "retriever": "local:x@1"}
+    path.write_text(json.dumps({"grid": key, "queries": {"q": record()}}))
+    assert "q" in sweep.load_cache(path, key)["queries"]
+    assert sweep.load_cache(path, {**key, "retriever": "elasticsearch:idx:uuid"})["queries"] == {}
@@ -0,0 +1,61 @@
+import pytest
+
+from Py_files import tracing
+from Py_files.tracing import Tracer, profile, stage_totals
+
+
+def test_histograms_percentiles_and_buckets():
+    tracer = Tracer()
+    for ms in range(1, 101):
+        tracer.observe("rerank", float(ms))
+    h = tracer.histograms()["rerank"]
+    assert h["count"] == 100 and h["max_ms"] == 100.0
+    assert h["mean_ms"] == pytest.approx(50.5)
+    assert h["p50_ms"] == pytest.approx(50, abs=1) and h["p95_ms"] == pytest.approx(95, abs=1)
+    assert h["buckets"]["<=1"] == 1 and h["buckets"]["<=50"] == 25 and h["buckets"]["<=100"] == 50
+    assert sum(h["buckets"].values()) == 100
+
+
+def test_percentiles_use_recent_samples_count_uses_all():
+    tracer = Tracer(max_samples=10)
+    for ms in [1000.0] * 5 + [1.0] * 10:
+        tracer.observe("search", ms)
+    h = tracer.histograms()["search"]
+    assert h["count"] == 15 and h["max_ms"] == 1.0
+    assert h["buckets"][">10000"] == 0 and h["buckets"]["<=1000"] == 5
+
+
+def test_span_times_block_even_on_error(monkeypatch):
+    clock = iter([10.0, 10.25])
+    monkeypatch.setattr(tracing.time, "perf_counter", lambda: next(clock))
+    tracer = Tracer()
+    tracer._otel = None
+    with pytest.raises(RuntimeError):
+        with tracer.span("embed"):
+            raise RuntimeError
+    assert tracer.histograms()["embed"]["max_ms"] == pytest.approx(250.0)
+
+
+def test_reset_clears_everything():
+    tracer = Tracer()
+    tracer.observe("x", 1.0)
+    tracer.reset()
+    assert tracer.histograms() == {}
+
+
+def test_stage_totals_sums_repeated_stages():
+    timeline = [
+        {"stage": "rerank", "start_ms": 0.0, "end_ms": 5.0},
+        {"stage": "search", "start_ms": 5.0, "end_ms": 7.5},
+        {"stage": "rerank", "start_ms": 7.5, "end_ms": 10.0},
+    ]
+    assert stage_totals(timeline) == {"rerank": 7.5, "search": 2.5}
+
+
+def test_profile_reports_and_rejects_unknown_kind():
+    with profile("cprofile", limit=5) as result:
+        sum(range(1000))
+    assert "function calls" in result["report"]
+    with pytest.raises(ValueError):
+        with profile("perf"):
+            pass